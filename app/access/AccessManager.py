@@ -1,28 +1,20 @@
 import os
 import jwt
-from cryptography.hazmat.primitives import serialization
-import jwt.algorithms
 from .models.AccessData import AccessData
+from . import KeyResolver, SigningKey, TokenCache
+from ..common import DynamoDB
 import time
 import secrets
 import hashlib
-import boto3
-import requests
-import json
-
-privateKeyFile = os.environ['PRIVATE_KEY_FILE']
-encryptionPasswordFile = os.environ['ENCRYPTION_PASSWORD_FILE']
-
-# Public key
-publicKeyURL = "https://physical.spencerhartland.com/auth/keys"
 
 # DynamoDB
-dynamoDBResourceName = 'dynamodb'
 dynamoDBTokensTableName = 'Physical-iOS_Tokens'
-dynamoDBItemKey = 'Item'
-dynamoDBRegionName = 'us-west-1'
-dynamodb = boto3.resource(dynamoDBResourceName, region_name=dynamoDBRegionName)
-tokensTable = dynamodb.Table(dynamoDBTokensTableName)
+dynamoDBItemKey = DynamoDB.dynamoDBItemKey
+# DynamoDB TTL attribute, in seconds since the Unix epoch
+expiresAtKey = "expiresAt"
+
+# Seconds a refresh token remains valid
+refreshTokenLifetime = int(os.environ.get('REFRESH_TOKEN_LIFETIME', 60 * 24 * 3600))
 
 def provideAccessFor(sub: str) -> AccessData:
     """
@@ -52,25 +44,39 @@ def exchange(token: str) -> AccessData:
 
     # Generate the provided token's hash value
     tokenHash = hashlib.sha256(token.encode()).hexdigest()
-    # Validate hash
+    # Validate and consume the hash in one conditional delete (one use only). 
+    # Of two concurrent exchanges of the same token, only one can succeed. 
+    # Expired tokens may not have been removed by TTL yet, so are rejected here.
     try:
-        # if the hash is in the table, it is valid.
-        dbResponse = tokensTable.get_item(
-            Key = { "tokenHash": tokenHash }
-        )
-
-        # remove the token from the table (one use only)
-        _ = tokensTable.delete_item(
-            Key = { "tokenHash": tokenHash }
+        dbResponse = DynamoDB.client.delete_item(
+            TableName = dynamoDBTokensTableName,
+            Key = { "tokenHash": { "S": tokenHash } },
+            ConditionExpression = f"attribute_exists(tokenHash) AND (attribute_not_exists({expiresAtKey}) OR {expiresAtKey} > :now)",
+            ExpressionAttributeValues = { ":now": { "N": str(int(time.time())) } },
+            ReturnValues = "ALL_OLD"
         )
 
-        sub = dbResponse["Item"]["sub"]
+        sub = dbResponse["Attributes"]["sub"]["S"]
     except:
         raise Exception("No record of the provided refresh token.")
     
     # Provide access
     return provideAccessFor(sub)
 
+def revoke(token: str):
+    """
+    Revokes a refresh token, so that it can no longer be exchanged.
+
+    Parameters:
+        token: The refresh token to revoke.
+    """
+
+    tokenHash = hashlib.sha256(token.encode()).hexdigest()
+    DynamoDB.client.delete_item(
+        TableName = dynamoDBTokensTableName,
+        Key = { "tokenHash": { "S": tokenHash } }
+    )
+
 def validate(token: str) -> dict:
     """
     Checks the validity of an access token.
@@ -92,19 +98,29 @@ def validate(token: str) -> dict:
         ```
     """
 
+    # Tokens already verified by this container skip signature verification
+    cachedClaims = TokenCache.get(token)
+    if cachedClaims is not None:
+        return cachedClaims
+
     publicKey = __retrievePublicKeyFor(token)
-    return jwt.decode(
+    claims = jwt.decode(
         token, 
         key=publicKey, 
         algorithms=["ES256"], 
         audience="com.spencerhartland.Physical", 
         issuer="https://physical.spencerhartland.com"
     )
+    if TokenCache.isRevoked(claims):
+        raise jwt.InvalidTokenError("The access token has been revoked.")
+
+    TokenCache.put(token, claims)
+    return claims
 
 
 def __generateAccessTokenFor(sub: str) -> str:
     iat = int(time.time())
-    privateKey = __retrievePrivateKey()
+    privateKey, keyID = SigningKey.current()
 
     payloadData = {
         "iss": "https://physical.spencerhartland.com",
@@ -117,7 +133,8 @@ def __generateAccessTokenFor(sub: str) -> str:
     return jwt.encode(
     payload=payloadData,
     key=privateKey,
-    algorithm='ES256'
+    algorithm='ES256',
+    headers={"kid": keyID}
     )
 
 def __generateRefreshTokenFor(sub: str) -> str:
@@ -127,10 +144,12 @@ def __generateRefreshTokenFor(sub: str) -> str:
     tokenHash = hashlib.sha256(token.encode()).hexdigest()
     # Store the hash in DB
     try:
-        tokensTable.put_item(
+        DynamoDB.client.put_item(
+            TableName=dynamoDBTokensTableName,
             Item={ 
-                "tokenHash": tokenHash,
-                "sub": sub
+                "tokenHash": { "S": tokenHash },
+                "sub": { "S": sub },
+                expiresAtKey: { "N": str(int(time.time()) + refreshTokenLifetime) }
             }
         )
     except Exception as error:
@@ -138,23 +157,9 @@ def __generateRefreshTokenFor(sub: str) -> str:
     
     return token
 
-def __retrievePublicKeyFor(token: str) -> serialization.PublicFormat:
+def __retrievePublicKeyFor(token: str):
     try:
         header = jwt.get_unverified_header(token)
-        keyID = header.get("kid")
-
-        result = requests.get(publicKeyURL)
-        jwks = result.json()
-        for jwk in jwks["keys"]:
-            if keyID == jwk["kid"]:
-                return jwt.algorithms.ECAlgorithm.from_jwk(json.dumps(jwk))
+        return KeyResolver.keyFor(header.get("kid"))
     except:
         raise Exception("An error occurred while attempting to fetch the public key.")
-
-def __retrievePrivateKey() -> serialization.PrivateFormat:
-    password = __retrieveEncryptionPassword()
-    privateKeyBytes = open(privateKeyFile, 'rb').read()
-    return serialization.load_pem_private_key(privateKeyBytes, password=password)
-
-def __retrieveEncryptionPassword() -> bytes:
-    return open(encryptionPasswordFile, 'rb').read().strip()
\ No newline at end of file
@@ -0,0 +1,143 @@
+import os
+import time
+import threading
+import jwt
+import jwt.algorithms
+from . import SigningKey
+from ..common import HTTPClient, Stats
+
+# Published key set, used for key IDs that do not belong to a local key
+publicKeyURL = "https://physical.spencerhartland.com/auth/keys"
+publicKeyTimeout = 5
+
+# Seconds before the published key set is fetched again
+keySetTTL = int(os.environ.get('ACCESS_KEY_SET_TTL', 3600))
+# Minimum seconds between fetches triggered by an unknown key ID
+unknownKeyRefreshInterval = 30
+# Seconds before a failed fetch is retried, doubled after each failure in a
+# row (up to `keySetTTL`)
+refreshRetryBaseDelay = 5
+
+__lock = threading.Lock()
+# Held while the key set is fetched, so that only one fetch runs at a time
+__refreshLock = threading.Lock()
+__publishedKeys = {}
+__loadedAt = 0.0
+__nextRefreshAt = 0.0
+__failedRefreshes = 0
+__lastUnknownRefresh = 0.0
+__stats = {
+    "hits": 0,
+    "misses": 0,
+    "refreshes": 0,
+    "refreshErrors": 0
+}
+
+def keyFor(keyID: str):
+    """
+    Resolves the public key used to verify an access token.
+
+    Keys held by this container (see `SigningKey`) are resolved without any
+    network access. The published key set is only fetched for key IDs that
+    are not held locally, then cached for `keySetTTL` seconds. Fetches
+    triggered by an unknown key ID happen at most once per
+    `unknownKeyRefreshInterval`. Only one fetch runs at a time, and a failed
+    fetch is retried with exponential backoff while the previous keys keep
+    being served.
+
+    Parameters:
+        keyID: The `kid` header of the token, or `None` if the header is absent.
+
+    Returns:
+        The public key matching `keyID`.
+
+    Raises:
+        KeyError: No key matching `keyID` could be found.
+    """
+
+    global __lastUnknownRefresh
+
+    now = time.monotonic()
+    if __publishedKeys and now >= __nextRefreshAt:
+        # Another request may already be refreshing the stale keys
+        __refresh(wait=False)
+
+    key = __lookup(keyID)
+    if key is not None:
+        __stats["hits"] += 1
+        return key
+
+    __stats["misses"] += 1
+    with __lock:
+        shouldRefresh = now - __lastUnknownRefresh > unknownKeyRefreshInterval
+        if shouldRefresh:
+            __lastUnknownRefresh = now
+    if shouldRefresh:
+        __refresh(wait=True)
+        key = __lookup(keyID)
+        if key is not None:
+            return key
+
+    raise KeyError(f"No public key found for key ID {keyID}.")
+
+def stats() -> dict:
+    """
+    Returns the resolver's counters, along with the number of published keys
+    currently held and the age of the published key set in seconds.
+    """
+
+    return {
+        **__stats,
+        "publishedKeys": len(__publishedKeys),
+        "age": time.monotonic() - __loadedAt if __loadedAt else None
+    }
+
+def __lookup(keyID: str):
+    try:
+        # Tokens issued before key IDs were added to the header
+        if keyID is None:
+            _, keyID = SigningKey.current()
+        key = SigningKey.publicKeys().get(keyID)
+    except Exception:
+        # A container without a usable local key only has the published keys
+        key = None
+
+    if key is None and keyID is not None:
+        key = __publishedKeys.get(keyID)
+    return key
+
+def __refresh(wait: bool):
+    global __publishedKeys, __loadedAt, __nextRefreshAt, __failedRefreshes
+
+    if not __refreshLock.acquire(blocking=wait):
+        return
+    try:
+        # A fetch that finished while this one waited makes it unnecessary
+        if wait and __loadedAt and time.monotonic() - __loadedAt < unknownKeyRefreshInterval:
+            return
+
+        try:
+            result = HTTPClient.get(publicKeyURL, timeout=publicKeyTimeout)
+            result.raise_for_status()
+            keys = {}
+            for jwk in result.json()["keys"]:
+                keys[jwk["kid"]] = jwt.algorithms.ECAlgorithm.from_jwk(jwk)
+        except Exception as error:
+            # Keep serving the previous keys, and back off before trying again
+            print(f"Unable to fetch the published public keys. {error}")
+            with __lock:
+                __nextRefreshAt = time.monotonic() + min(keySetTTL, refreshRetryBaseDelay * (2 ** __failedRefreshes))
+                __failedRefreshes += 1
+                __stats["refreshErrors"] += 1
+            return
+
+        with __lock:
+            __publishedKeys = keys
+            __loadedAt = time.monotonic()
+            __nextRefreshAt = __loadedAt + keySetTTL
+            __failedRefreshes = 0
+            __stats["refreshes"] += 1
+    finally:
+        __refreshLock.release()
+
+Stats.register("keyResolver", stats)
@@ -0,0 +1,130 @@
+import os
+import json
+import time
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+import jwt.algorithms
+from cryptography.hazmat.primitives import serialization
+
+privateKeyFile = os.environ['PRIVATE_KEY_FILE']
+encryptionPasswordFile = os.environ['ENCRYPTION_PASSWORD_FILE']
+
+# Optional explicit key identifier. When unset, the RFC 7638 thumbprint of the
+# public key is used.
+signingKeyID = os.environ.get('SIGNING_KEY_ID')
+
+# Seconds between checks of the key files for rotation
+reloadCheckInterval = int(os.environ.get('SIGNING_KEY_RELOAD_INTERVAL', 60))
+# Number of retired public keys kept so tokens issued before a rotation still verify
+retainedKeyCount = 2
+
+__lock = threading.Lock()
+__privateKey = None
+__keyID = None
+__publicKeys = OrderedDict()
+__version = None
+__lastCheck = 0.0
+# Why the key could not be loaded, while no key has been loaded yet
+__loadError = None
+
+def current() -> tuple:
+    """
+    Returns the signing key, decrypting it only on first use or after the
+    key files have changed. If the changed files cannot be loaded, the
+    previous key is kept.
+
+    Returns:
+        A tuple of the private key and its key ID.
+    """
+
+    __checkForRotation()
+    return __privateKey, __keyID
+
+def publicKeys() -> dict:
+    """
+    Returns the public keys of the current signing key and of recently
+    retired signing keys, indexed by key ID.
+    """
+
+    __checkForRotation()
+    return __publicKeys
+
+def reload(version=None):
+    """
+    Reloads the signing key from disk.
+
+    Parameters:
+        version:
+            An explicit version for the key files. If given, the key is only
+            reloaded when it differs from the loaded version. Otherwise, the
+            modification times of the key files are used.
+    """
+
+    global __privateKey, __keyID, __publicKeys, __version, __lastCheck
+
+    with __lock:
+        __lastCheck = time.monotonic()
+        if version is None:
+            version = __fileVersion()
+        if version == __version and __privateKey is not None:
+            return
+
+        password = open(encryptionPasswordFile, 'rb').read().strip()
+        privateKeyBytes = open(privateKeyFile, 'rb').read()
+        privateKey = serialization.load_pem_private_key(privateKeyBytes, password=password)
+        keyID = keyIDFor(privateKey.public_key())
+
+        publicKeys = OrderedDict(__publicKeys)
+        publicKeys.pop(keyID, None)
+        publicKeys[keyID] = privateKey.public_key()
+        while len(publicKeys) > retainedKeyCount + 1:
+            publicKeys.popitem(last=False)
+
+        # Publish the new key in a single assignment per attribute
+        __publicKeys = publicKeys
+        __privateKey = privateKey
+        __keyID = keyID
+        __version = version
+
+def keyIDFor(publicKey) -> str:
+    """
+    Returns the key ID for the signing key: `SIGNING_KEY_ID` if set,
+    otherwise the RFC 7638 thumbprint of `publicKey`.
+    """
+
+    if signingKeyID:
+        return signingKeyID
+
+    jwk = json.loads(jwt.algorithms.ECAlgorithm.to_jwk(publicKey))
+    members = {name: jwk[name] for name in ("crv", "kty", "x", "y")}
+    canonical = json.dumps(members, separators=(",", ":"), sort_keys=True)
+    digest = hashlib.sha256(canonical.encode()).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+def __checkForRotation():
+    global __loadError
+
+    due = time.monotonic() - __lastCheck > reloadCheckInterval
+    if __privateKey is not None and not due:
+        return
+    # Without a key, the files are only read again once per interval
+    if __privateKey is None and __loadError is not None and not due:
+        raise __loadError
+
+    try:
+        reload()
+        __loadError = None
+    except Exception as error:
+        if __privateKey is None:
+            __loadError = error
+            raise
+        # Keep the last good key, such as while rotated files are half written
+        print(f"Unable to reload the signing key. {error}")
+
+def __fileVersion() -> tuple:
+    return (
+        os.stat(privateKeyFile).st_mtime_ns,
+        os.stat(encryptionPasswordFile).st_mtime_ns
+    )
@@ -0,0 +1,133 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from ..common import Stats
+
+# Maximum number of verified tokens held per container
+maxEntries = int(os.environ.get('ACCESS_TOKEN_CACHE_SIZE', 10000))
+
+__lock = threading.Lock()
+# sha256(token) -> (claims, exp), least recently used first
+__entries = OrderedDict()
+__revocationChecks = []
+__stats = {
+    "hits": 0,
+    "misses": 0,
+    "evictions": 0,
+    "expirations": 0,
+    "revocations": 0
+}
+
+def get(token: str) -> dict:
+    """
+    Returns the verified claims of an access token, if the token has already
+    been verified by this container and has not since expired or been revoked.
+
+    Parameters:
+        token: The client's API access token.
+
+    Returns:
+        The token's claims, or `None` if the token must be verified.
+    """
+
+    key = __keyFor(token)
+    with __lock:
+        entry = __entries.get(key)
+        if entry is None:
+            __stats["misses"] += 1
+            return None
+
+        claims, exp = entry
+        if exp <= time.time():
+            del __entries[key]
+            __stats["expirations"] += 1
+            __stats["misses"] += 1
+            return None
+
+        __entries.move_to_end(key)
+
+    if isRevoked(claims):
+        invalidate(token)
+        __stats["misses"] += 1
+        return None
+
+    __stats["hits"] += 1
+    return claims
+
+def put(token: str, claims: dict):
+    """
+    Stores the verified claims of an access token until the token's `exp`.
+
+    Parameters:
+        token: The client's API access token.
+        claims: The claims of the token, as returned by `jwt.decode`.
+    """
+
+    exp = claims.get("exp")
+    if exp is None or maxEntries <= 0:
+        return
+
+    key = __keyFor(token)
+    with __lock:
+        __entries[key] = (claims, exp)
+        __entries.move_to_end(key)
+        while len(__entries) > maxEntries:
+            __entries.popitem(last=False)
+            __stats["evictions"] += 1
+
+def invalidate(token: str):
+    """
+    Removes a single access token from the cache.
+    """
+
+    with __lock:
+        __entries.pop(__keyFor(token), None)
+
+def revokeSubject(sub: str):
+    """
+    Removes every cached access token issued to the given subject (user).
+    """
+
+    with __lock:
+        revoked = [key for key, (claims, _) in __entries.items() if claims.get("sub") == sub]
+        for key in revoked:
+            del __entries[key]
+        __stats["revocations"] += len(revoked)
+
+def addRevocationCheck(check):
+    """
+    Registers a revocation check, which is run against the claims of every
+    token before it is served from the cache or stored in it.
+
+    Parameters:
+        check:
+            A callable that takes a token's claims and returns `True` if the
+            token has been revoked.
+    """
+
+    __revocationChecks.append(check)
+
+def isRevoked(claims: dict) -> bool:
+    """
+    Returns `True` if any registered revocation check rejects the claims.
+    """
+
+    return any(check(claims) for check in __revocationChecks)
+
+def stats() -> dict:
+    """
+    Returns the cache's counters, along with its current size and capacity.
+    """
+
+    return {
+        **__stats,
+        "size": len(__entries),
+        "capacity": maxEntries
+    }
+
+def __keyFor(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+Stats.register("tokenCache", stats)
@@ -0,0 +1,157 @@
+import re
+import time
+import threading
+import jwt
+import jwt.algorithms
+from ..common import HTTPClient, Stats
+
+publicKeyURL = "https://appleid.apple.com/auth/keys"
+publicKeyTimeout = 5
+
+# Used when Apple's response carries no usable Cache-Control max-age
+defaultMaxAge = 3600
+# Minimum seconds between fetches triggered by an unknown key ID
+unknownKeyRefetchInterval = 10
+# Seconds before a failed fetch is retried, doubled after each failure in a
+# row (up to `defaultMaxAge`)
+fetchRetryBaseDelay = 5
+
+maxAgePattern = re.compile(r"max-age=(\d+)")
+
+__lock = threading.Lock()
+# Held while the keys are fetched, so that only one fetch runs at a time
+__fetchLock = threading.Lock()
+__keys = {}
+__fetchedAt = 0.0
+__expiresAt = 0.0
+__retryAt = 0.0
+__failedFetches = 0
+__lastUnknownFetch = 0.0
+__revalidating = False
+__stats = {
+    "hits": 0,
+    "staleHits": 0,
+    "misses": 0,
+    "fetches": 0,
+    "fetchErrors": 0
+}
+
+def keyFor(keyID: str):
+    """
+    Returns Apple's public key for the given key ID.
+
+    Parsed keys are shared by every request in the container. Once the
+    response's max-age has elapsed, the stored keys keep being served while
+    a background fetch revalidates them. An unknown key ID triggers an
+    immediate fetch, at most once per `unknownKeyRefetchInterval` seconds,
+    even before any key has been fetched. Only one fetch runs at a time, and
+    a failed fetch is retried with exponential backoff.
+
+    Parameters:
+        keyID: The `kid` header of the identity token.
+
+    Returns:
+        The RSA public key matching `keyID`.
+
+    Raises:
+        KeyError: Apple has not published a key matching `keyID`.
+    """
+
+    global __lastUnknownFetch
+
+    now = time.monotonic()
+    key = __keys.get(keyID)
+    if key is not None:
+        if now < __expiresAt:
+            __stats["hits"] += 1
+        else:
+            __stats["staleHits"] += 1
+            if now >= __retryAt:
+                __revalidateInBackground()
+        return key
+
+    __stats["misses"] += 1
+    with __lock:
+        shouldFetch = now >= __retryAt and now - __lastUnknownFetch > unknownKeyRefetchInterval
+        if shouldFetch:
+            __lastUnknownFetch = now
+    if shouldFetch:
+        __fetch(wait=True)
+        key = __keys.get(keyID)
+        if key is not None:
+            return key
+
+    raise KeyError(f"Apple has not published a key with ID {keyID}.")
+
+def stats() -> dict:
+    """
+    Returns the store's counters, along with the number of keys currently
+    held and the seconds remaining until they go stale.
+    """
+
+    return {
+        **__stats,
+        "keys": len(__keys),
+        "freshFor": __expiresAt - time.monotonic()
+    }
+
+def __revalidateInBackground():
+    global __revalidating
+
+    with __lock:
+        if __revalidating:
+            return
+        __revalidating = True
+
+    def revalidate():
+        global __revalidating
+        try:
+            __fetch(wait=False)
+        finally:
+            __revalidating = False
+
+    threading.Thread(target=revalidate, daemon=True).start()
+
+def __fetch(wait: bool):
+    global __keys, __fetchedAt, __expiresAt, __retryAt, __failedFetches
+
+    if not __fetchLock.acquire(blocking=wait):
+        return
+    try:
+        # A fetch that finished while this one waited makes it unnecessary
+        now = time.monotonic()
+        if wait and (now < __retryAt or (__fetchedAt and now - __fetchedAt < unknownKeyRefetchInterval)):
+            return
+
+        __stats["fetches"] += 1
+        try:
+            response = HTTPClient.get(publicKeyURL, timeout=publicKeyTimeout)
+            response.raise_for_status()
+            keys = {}
+            for jwk in response.json()["keys"]:
+                keys[jwk["kid"]] = jwt.algorithms.RSAAlgorithm.from_jwk(jwk)
+        except Exception as error:
+            # Keep serving the keys we already have, and back off before trying again
+            print(f"Unable to refresh Apple's public keys. {error}")
+            with __lock:
+                __retryAt = time.monotonic() + min(defaultMaxAge, fetchRetryBaseDelay * (2 ** __failedFetches))
+                __failedFetches += 1
+                __stats["fetchErrors"] += 1
+            return
+
+        with __lock:
+            __keys = keys
+            __fetchedAt = time.monotonic()
+            __expiresAt = __fetchedAt + __maxAge(response.headers.get("Cache-Control", ""))
+            __retryAt = 0.0
+            __failedFetches = 0
+    finally:
+        __fetchLock.release()
+
+def __maxAge(cacheControl: str) -> int:
+    match = maxAgePattern.search(cacheControl)
+    if match is None:
+        return defaultMaxAge
+    return int(match.group(1))
+
+Stats.register("appleKeyStore", stats)
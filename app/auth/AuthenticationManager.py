@@ -1,17 +1,15 @@
-import json
 import os
+import time
+import concurrent.futures
 import requests
 import jwt
-from ..common import HTTP, Error
+from ..common import HTTP, Error, HTTPClient, JSON
 from .models.AuthenticationData import AuthenticationData
+from . import AppleKeyStore, ClientSecret
 from ..access import AccessManager
 
-# Environment variables
-clientSecretFile = os.environ['CLIENT_SECRET_FILE']
-
 clientID = "com.spencerhartland.Physical"
 validationURL = "https://appleid.apple.com/auth/token"
-publicKeyURL = "https://appleid.apple.com/auth/keys"
 issuer = "https://appleid.apple.com"
 publicKeyAlgo = "RS256"
 asciiEncoding = "ascii"
@@ -25,6 +23,13 @@ issuerFieldKey = "iss"
 audienceFieldKey = "aud"
 expirationFieldKey = "exp"
 
+# Seconds allowed for the outbound calls made while authenticating
+authenticationDeadline = float(os.environ.get('AUTHENTICATION_DEADLINE', 10))
+
+# Runs identity token verification and the outbound calls, so that each can be
+# abandoned once the deadline passes. A login occupies up to three workers.
+__executor = concurrent.futures.ThreadPoolExecutor(max_workers=24, thread_name_prefix="auth")
+
 # Validation request headers
 validationHeaders = {
     "Content-Type": "application/x-www-form-urlencoded"
@@ -47,67 +52,81 @@ def authenticate(authDataDict):
     try:
         authData = AuthenticationData(authDataDict)
     except Error.AttributeNotFoundError:
-        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, json.dumps({"message": "The authentication data is improperly formmatted."}))
+        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, JSON.message("The authentication data is improperly formmatted."))
+    if authData.grantType not in (grantTypeAuthorizationCode, grantTypeRefreshToken):
+        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, JSON.message(f"The grant type must be `{grantTypeAuthorizationCode}` or `{grantTypeRefreshToken}`."))
     
-    # Get public key from Apple's endpoint
-    publicKeys = {}
-    publicKeyResponse = requests.get(publicKeyURL)
-    if publicKeyResponse.status_code == HTTP.statusOK:
-        try:
-            jwks = publicKeyResponse.json()
-            for jwk in jwks["keys"]:
-                keyID = jwk["kid"]
-                publicKeys[keyID] = jwt.algorithms.RSAAlgorithm.from_jwk(json.dumps(jwk))
-        except:
-            return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, json.dumps({"message":"Unable to decode response from public keys endpoint."}))
-    else:
-        return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, json.dumps({"message":"Unable to retrieve public key."}))
-        
+    # Apple's validation of the authorization code does not depend on the 
+    # identity token, so both run at once. Verification may fetch Apple's 
+    # public keys, so it is bound by the deadline as well.
+    deadline = time.monotonic() + authenticationDeadline
+    grantToken = authData.authCode if authData.grantType == grantTypeAuthorizationCode else authData.refreshToken
+    validationFuture = __executor.submit(validate, grantToken, authData.grantType)
+    verificationFuture = __executor.submit(verifyToken, authData.identityToken)
+
     try:
         # Verify identity token using Apple's public key
-        identityToken = verifyToken(authData.identityToken, publicKeys)
-        # Validate authorization code with Apple ID server
-        validation = validate(authData.authCode, authData.grantType)
-        if validation.status_code == HTTP.statusOK:
-            try:
-                # Get Sign in with Apple (SIWA) refresh token
-                tokenResponse = validation.json()
-            except:
-                return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, json.dumps({"message":"TokenResponse object could not be decoded."}))
-            
-            SIWARefreshToken = tokenResponse["refresh_token"]
-            # Get user ID from identity token
-            sub = identityToken["sub"]
-            
-            try:
-                # Generate API access token and refresh token for user
-                accessData = AccessManager.provideAccessFor(sub)
-            except Exception as error:
-                print(error)
-                return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, json.dumps({"message":"Unable to store token hash."}))
-            
-            authResponse = {
-                "SIWARefreshToken": SIWARefreshToken,
-                "accessToken": accessData.accessToken,
-                "refreshToken": accessData.refreshToken
-            }
-            return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, json.dumps(authResponse))
-        else:
-            return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, json.dumps({"message":"The authorization code could not be validated."}))
+        identityToken = verificationFuture.result(timeout=max(0, deadline - time.monotonic()))
+        # Get user ID from identity token
+        sub = identityToken["sub"]
+    except concurrent.futures.TimeoutError:
+        validationFuture.cancel()
+        return HTTP.response(HTTP.statusGatewayTimeout, HTTP.standardHTTPResponseHeaders, JSON.message("The identity token could not be verified in time."))
     except:
-        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, json.dumps({"message":"The authenticity of the identity token could not be confirmed."}))
+        # Don't wait for Apple; the request fails either way
+        validationFuture.cancel()
+        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, JSON.message("The authenticity of the identity token could not be confirmed."))
+
+    # Generate API access token and refresh token for user while Apple 
+    # validates the authorization code
+    accessFuture = __executor.submit(AccessManager.provideAccessFor, sub)
 
-def verifyToken(identityToken, keys) -> dict:
+    try:
+        validation = validationFuture.result(timeout=max(0, deadline - time.monotonic()))
+    except concurrent.futures.TimeoutError:
+        __discard(accessFuture)
+        return HTTP.response(HTTP.statusGatewayTimeout, HTTP.standardHTTPResponseHeaders, JSON.message("The authorization code could not be validated in time."))
+    except:
+        __discard(accessFuture)
+        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, JSON.message("The authorization code could not be validated."))
+
+    if validation.status_code != HTTP.statusOK:
+        __discard(accessFuture)
+        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, JSON.message("The authorization code could not be validated."))
+
+    try:
+        # Get Sign in with Apple (SIWA) refresh token
+        tokenResponse = validation.json()
+        SIWARefreshToken = tokenResponse["refresh_token"]
+    except:
+        __discard(accessFuture)
+        return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, JSON.message("TokenResponse object could not be decoded."))
+
+    try:
+        accessData = accessFuture.result(timeout=max(0, deadline - time.monotonic()))
+    except concurrent.futures.TimeoutError:
+        __discard(accessFuture)
+        return HTTP.response(HTTP.statusGatewayTimeout, HTTP.standardHTTPResponseHeaders, JSON.message("Unable to store token hash in time."))
+    except Exception as error:
+        print(error)
+        return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, JSON.message("Unable to store token hash."))
+    
+    authResponse = {
+        "SIWARefreshToken": SIWARefreshToken,
+        "accessToken": accessData.accessToken,
+        "refreshToken": accessData.refreshToken
+    }
+    return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, JSON.dumps(authResponse))
+
+def verifyToken(identityToken) -> dict:
     """
     Verifies the signature and claims of a JSON Web Token obtained by a user 
     authenticating via Sign in with Apple.
     
     Parameters:
         identityToken: 
-            The Apple-provided JWT to be verified.
-        keys: 
-            A list of public keys which contains the key needed to verify
-            the token. This is provided by the issuer of the token (Apple).
+            The Apple-provided JWT to be verified. The key needed to verify it 
+            is looked up in `AppleKeyStore` by the token's key ID.
 
     Returns:
         The decoded payload of the JWT identity token, as a dictionary.
@@ -115,8 +134,8 @@ def verifyToken(identityToken, keys) -> dict:
 
     # Get public key ID from JWT header
     keyID = jwt.get_unverified_header(identityToken)["kid"]
-    # Get key from list of Apple's public keys
-    key = keys[keyID]
+    # Get key from Apple's public keys
+    key = AppleKeyStore.keyFor(keyID)
     try:
         # `decode` handles verification of signature and claims. If not verfied, it will raise an error.
         return jwt.decode(identityToken, key=key, algorithms=[publicKeyAlgo], audience=clientID, issuer=issuer)
@@ -140,10 +159,9 @@ def validate(token, grantType) -> requests.Response:
         The `requests.Response` from Apple's token validation endpoint.
     """
     
-    clientSecret = __retrieveClientSecret()
     requestData = {
         "client_id": clientID,
-        "client_secret": clientSecret,
+        "client_secret": ClientSecret.current(),
         "grant_type": grantType
     }
     if grantType == grantTypeAuthorizationCode:
@@ -151,8 +169,15 @@ def validate(token, grantType) -> requests.Response:
     elif grantType == grantTypeRefreshToken:
         requestData["refresh_token"] = token
     
-    return requests.post(validationURL, data=requestData, headers=validationHeaders, timeout=10)
+    return HTTPClient.post(validationURL, data=requestData, headers=validationHeaders, timeout=authenticationDeadline)
         
-def __retrieveClientSecret() -> str:
-    with open(clientSecretFile, "r") as file:
-        return file.read().strip()
\ No newline at end of file
+def __discard(accessFuture: concurrent.futures.Future):
+    # Revokes tokens generated for a login that failed, once they exist
+    if not accessFuture.cancel():
+        accessFuture.add_done_callback(__revoke)
+
+def __revoke(accessFuture: concurrent.futures.Future):
+    try:
+        AccessManager.revoke(accessFuture.result().refreshToken)
+    except Exception as error:
+        print(f"Unable to revoke the refresh token of a failed login. {error}")
\ No newline at end of file
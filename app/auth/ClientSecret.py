@@ -0,0 +1,94 @@
+import os
+import time
+import threading
+import jwt
+from cryptography.hazmat.primitives import serialization
+
+# Sign in with Apple key, used to mint the client secret
+teamID = os.environ.get('APPLE_TEAM_ID')
+keyID = os.environ.get('APPLE_KEY_ID')
+privateKeyFile = os.environ.get('APPLE_PRIVATE_KEY_FILE')
+
+# Static client secret, used when the key above is not configured
+clientSecretFile = os.environ.get('CLIENT_SECRET_FILE')
+
+clientID = "com.spencerhartland.Physical"
+audience = "https://appleid.apple.com"
+
+# Seconds a minted client secret is valid (Apple allows up to six months)
+lifetime = int(os.environ.get('CLIENT_SECRET_LIFETIME', 24 * 3600))
+# Seconds before expiry at which a new client secret is minted
+renewalMargin = 300
+
+__lock = threading.Lock()
+__privateKey = None
+# (client secret, expiry in seconds since the Unix epoch), replaced as a whole
+__current = (None, 0)
+
+def current() -> str:
+    """
+    Returns the client secret used to validate tokens with Apple.
+
+    If the team ID, key ID and .p8 key are configured, the secret is an ES256
+    JWT minted in-process and cached until `renewalMargin` seconds before it
+    expires. Otherwise, the static secret from `CLIENT_SECRET_FILE` is read
+    once and cached.
+
+    Returns:
+        The client secret.
+    """
+
+    secret, expiresAt = __current
+    if secret is not None and time.time() < expiresAt - renewalMargin:
+        return secret
+
+    with __lock:
+        # Another thread may have renewed it while this one waited
+        secret, expiresAt = __current
+        if secret is not None and time.time() < expiresAt - renewalMargin:
+            return secret
+        return __renew()
+
+def __renew() -> str:
+    global __current
+
+    if teamID and keyID and privateKeyFile:
+        secret, expiresAt = __mint()
+    else:
+        with open(clientSecretFile, "r") as file:
+            secret = file.read().strip()
+        expiresAt = __unverifiedExpiry(secret)
+
+    __current = (secret, expiresAt)
+    return secret
+
+def __mint() -> tuple:
+    global __privateKey
+
+    if __privateKey is None:
+        with open(privateKeyFile, "rb") as file:
+            __privateKey = serialization.load_pem_private_key(file.read(), password=None)
+
+    iat = int(time.time())
+    exp = iat + lifetime
+    secret = jwt.encode(
+        payload={
+            "iss": teamID,
+            "iat": iat,
+            "exp": exp,
+            "aud": audience,
+            "sub": clientID
+        },
+        key=__privateKey,
+        algorithm="ES256",
+        headers={"kid": keyID}
+    )
+    return secret, exp
+
+def __unverifiedExpiry(secret: str) -> float:
+    # A static secret is cached until its own expiry, so a rotated file is
+    # picked up once the old secret can no longer be used
+    try:
+        return jwt.decode(secret, options={"verify_signature": False}).get("exp", float("inf"))
+    except Exception:
+        return float("inf")
@@ -0,0 +1,111 @@
+import sys
+import time
+import json
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit, parse_qsl
+
+# Path at which the Lambda runtime interface emulator accepts invocations
+invocationPath = "/2015-03-31/functions/function/invocations"
+
+def run(url: str, requests: int, concurrency: int, headers: dict, lambdaEmulator: bool) -> dict:
+    """
+    Sends `requests` GET requests for `url` from `concurrency` threads, each
+    with its own kept-alive connection, and measures throughput and latency.
+
+    Parameters:
+        url:
+            The URL to request. In emulator mode, its path and query are sent
+            as an API Gateway event to the emulator at the URL's host.
+        requests: The total number of requests.
+        concurrency: The number of requests in flight at once.
+        headers: The headers of each request.
+        lambdaEmulator: Whether the target is the Lambda runtime interface emulator.
+
+    Returns:
+        A dictionary of the results.
+    """
+
+    target = urlsplit(url)
+    if lambdaEmulator:
+        query = dict(parse_qsl(target.query, keep_blank_values=True))
+        event = json.dumps({
+            "httpMethod": "GET",
+            "path": target.path,
+            "headers": headers,
+            "queryStringParameters": query or None,
+            "body": None
+        })
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def worker():
+        connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    break
+                remaining[0] -= 1
+
+            start = time.perf_counter()
+            try:
+                if lambdaEmulator:
+                    connection.request("POST", invocationPath, body=event, headers={"Content-Type": "application/json"})
+                else:
+                    connection.request("GET", f"{target.path}?{target.query}" if target.query else target.path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                failed = response.status >= 500
+            except Exception:
+                connection.close()
+                connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+                failed = True
+            elapsed = time.perf_counter() - start
+
+            with lock:
+                latencies.append(elapsed)
+                errors[0] += failed
+        connection.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "target": "lambda-emulator" if lambdaEmulator else "server",
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors[0],
+        "seconds": round(duration, 3),
+        "requestsPerSecond": round(requests / duration, 1),
+        "p50Milliseconds": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99Milliseconds": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2),
+        # A connection left waiting for a worker shows up here first
+        "maxMilliseconds": round(latencies[-1] * 1000, 2)
+    }
+
+def main(arguments: list):
+    parser = argparse.ArgumentParser(
+        description="Measures the throughput of the API server, or of the Lambda runtime interface emulator, which handles one invocation at a time."
+    )
+    parser.add_argument("url", help="For example http://localhost:8001/user?userID=...")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--token", help="An API access token, sent as a bearer token.")
+    parser.add_argument("--lambda-emulator", action="store_true", help="Invoke the Lambda runtime interface emulator at the URL's host instead.")
+    options = parser.parse_args(arguments)
+
+    headers = {"Authorization": f"Bearer {options.token}"} if options.token else {}
+    print(json.dumps(run(options.url, options.requests, options.concurrency, headers, options.lambda_emulator)))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,59 @@
+import os
+import gzip
+
+# brotli is offered when it is installed, gzip otherwise
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies shorter than this many bytes are sent uncompressed
+minimumSize = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+# gzip level (1-9) and brotli quality (0-11)
+gzipLevel = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+brotliQuality = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+
+encodingGzip = "gzip"
+encodingBrotli = "br"
+
+def negotiate(acceptEncoding: str) -> str:
+    """
+    Chooses the encoding of a response from the request's `Accept-Encoding`.
+
+    Returns:
+        `encodingBrotli` or `encodingGzip`, preferring brotli when it is
+        installed and the client accepts both, or `None` if the client
+        accepts neither.
+    """
+
+    if not acceptEncoding:
+        return None
+
+    accepted = {}
+    for member in acceptEncoding.split(","):
+        coding, _, parameters = member.strip().partition(";")
+        quality = 1.0
+        parameters = parameters.strip()
+        if parameters.startswith("q="):
+            try:
+                quality = float(parameters[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    wildcard = accepted.get("*", 0.0)
+    if brotli is not None and accepted.get(encodingBrotli, wildcard) > 0:
+        return encodingBrotli
+    if accepted.get(encodingGzip, wildcard) > 0:
+        return encodingGzip
+    return None
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """
+    Compresses a body with the given encoding (see `negotiate`).
+    """
+
+    if encoding == encodingBrotli:
+        return brotli.compress(data, quality=brotliQuality)
+    # mtime is fixed so that equal bodies compress to equal bytes
+    return gzip.compress(data, compresslevel=gzipLevel, mtime=0)
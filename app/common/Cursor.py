@@ -0,0 +1,40 @@
+import base64
+from . import Error, JSON
+
+def encode(cursor: dict) -> str:
+    """
+    Encodes pagination state as an opaque string for clients.
+
+    Parameters:
+        cursor: JSON-serializable pagination state, or `None`.
+
+    Returns:
+        The encoded cursor, or `None` if `cursor` is `None`.
+    """
+
+    if cursor is None:
+        return None
+    data = JSON.dumps(cursor).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+def decode(cursorString: str) -> dict:
+    """
+    Decodes a cursor provided by a client.
+
+    Returns:
+        The pagination state, or an empty dictionary if no cursor was provided.
+
+    Raises:
+        Error.InvalidCursorError: The cursor could not be decoded.
+    """
+
+    if not cursorString:
+        return {}
+    try:
+        padding = "=" * (-len(cursorString) % 4)
+        cursor = JSON.loads(base64.urlsafe_b64decode(cursorString + padding))
+    except Exception:
+        raise Error.InvalidCursorError()
+    if not isinstance(cursor, dict):
+        raise Error.InvalidCursorError()
+    return cursor
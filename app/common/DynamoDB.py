@@ -0,0 +1,208 @@
+import os
+import time
+import random
+from .Startup import Lazy
+
+# DynamoDB
+dynamoDBResourceName = 'dynamodb'
+dynamoDBItemKey = 'Item'
+
+# BatchGetItem / BatchWriteItem
+batchGetMaxKeys = 100
+batchWriteMaxItems = 25
+batchRetryAttempts = 8
+batchRetryBaseDelay = 0.05
+batchRetryMaxDelay = 2.0
+
+# Cancellation reason of a transaction item whose condition failed
+conditionalCheckFailed = "ConditionalCheckFailed"
+
+# Connection settings of the client shared by the container
+settings = {
+    "regionName": os.environ.get('DYNAMODB_REGION', 'us-west-1'),
+    # Points the whole data layer at a local DynamoDB stand-in when set
+    "endpointURL": os.environ.get('DYNAMODB_ENDPOINT_URL'),
+    "maxPoolConnections": int(os.environ.get('DYNAMODB_MAX_POOL_CONNECTIONS', 50)),
+    "retryMode": os.environ.get('DYNAMODB_RETRY_MODE', 'adaptive'),
+    "maxAttempts": int(os.environ.get('DYNAMODB_MAX_ATTEMPTS', 3)),
+    "connectTimeout": float(os.environ.get('DYNAMODB_CONNECT_TIMEOUT', 1)),
+    "readTimeout": float(os.environ.get('DYNAMODB_READ_TIMEOUT', 3)),
+    "tcpKeepalive": os.environ.get('DYNAMODB_TCP_KEEPALIVE', 'true').lower() == 'true'
+}
+
+def __config():
+    from botocore.config import Config
+
+    return Config(
+        region_name=settings["regionName"],
+        max_pool_connections=settings["maxPoolConnections"],
+        retries={
+            "mode": settings["retryMode"],
+            "max_attempts": settings["maxAttempts"]
+        },
+        connect_timeout=settings["connectTimeout"],
+        read_timeout=settings["readTimeout"],
+        tcp_keepalive=settings["tcpKeepalive"]
+    )
+
+def __createClient():
+    import boto3
+
+    # A plain client takes and returns items in DynamoDB's wire format, which
+    # every request in the app is built in
+    return boto3.session.Session().client(
+        dynamoDBResourceName,
+        endpoint_url=settings["endpointURL"],
+        config=__config()
+    )
+
+# Low-level client, shared by every module in the container
+client = Lazy("init:dynamodb", __createClient)
+
+def configure(**overrides):
+    """
+    Overrides connection settings (see `settings`) and discards the client
+    created with the previous settings. Intended for benchmarks and local 
+    runs against a DynamoDB stand-in.
+
+    Parameters:
+        overrides: Values for any of the keys in `settings`.
+    """
+
+    unknown = set(overrides) - set(settings)
+    if unknown:
+        raise KeyError(f"Unknown DynamoDB settings: {', '.join(sorted(unknown))}")
+
+    settings.update(overrides)
+    client.reset()
+
+def projection(attributeNames: list) -> dict:
+    """
+    Builds the request parameters that limit a read to the given attributes.
+    Every name is passed as a placeholder, so reserved words such as
+    `timestamp` can be projected.
+
+    Parameters:
+        attributeNames: The names of the top-level attributes to read.
+
+    Returns:
+        A dictionary with `ProjectionExpression` and `ExpressionAttributeNames`.
+    """
+
+    names = {f"#p{index}": name for index, name in enumerate(attributeNames)}
+    return {
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names
+    }
+
+def batchGet(tableName: str, keyName: str, keyValues: list, attributeNames: list = None):
+    """
+    Fetches many items by key with BatchGetItem, yielding them in the order
+    the keys were requested.
+
+    Keys are sent in chunks of at most `batchGetMaxKeys`. Keys that DynamoDB
+    leaves unprocessed are retried with exponential backoff and jitter. Each
+    chunk is yielded as soon as it is complete, so callers can start
+    serializing before every chunk has been fetched.
+
+    Parameters:
+        tableName: The name of the DynamoDB table.
+        keyName: The name of the table's (string) partition key.
+        keyValues: The key values to fetch. Duplicates are fetched once.
+        attributeNames: 
+            If given, only these attributes (and the key) are read from 
+            each item.
+
+    Yields:
+        A tuple of each key value and its item in DynamoDB's wire format, or
+        `None` if no item exists for the key.
+    """
+
+    for start in range(0, len(keyValues), batchGetMaxKeys):
+        chunk = keyValues[start:start + batchGetMaxKeys]
+        items = __batchGetChunk(tableName, keyName, list(dict.fromkeys(chunk)), attributeNames)
+        for keyValue in chunk:
+            yield keyValue, items.get(keyValue)
+
+def batchWrite(tableName: str, items: list):
+    """
+    Writes many items with BatchWriteItem, in chunks of at most
+    `batchWriteMaxItems`. Items that DynamoDB leaves unprocessed are retried
+    with exponential backoff and jitter.
+
+    Parameters:
+        tableName: The name of the DynamoDB table.
+        items: The items to put, in DynamoDB's wire format.
+    """
+
+    for start in range(0, len(items), batchWriteMaxItems):
+        requestItems = {
+            tableName: [{"PutRequest": {"Item": item}} for item in items[start:start + batchWriteMaxItems]]
+        }
+
+        for attempt in range(batchRetryAttempts):
+            if attempt > 0:
+                backoff(attempt)
+
+            response = client.batch_write_item(RequestItems=requestItems)
+            requestItems = response.get("UnprocessedItems")
+            if not requestItems:
+                break
+        else:
+            raise Exception(f"Unable to write every item to {tableName}.")
+
+def cancellationReasons(error: Exception) -> list:
+    """
+    Returns the cancellation reason code of each item of a failed
+    TransactWriteItems request, in the order the items were sent (`"None"`
+    for items that did not cause the cancellation).
+
+    Returns:
+        The reason codes, or `None` if `error` is not a cancelled transaction.
+    """
+
+    response = getattr(error, "response", {})
+    if response.get("Error", {}).get("Code") != "TransactionCanceledException":
+        return None
+    return [reason.get("Code") for reason in response.get("CancellationReasons", [])]
+
+def conditionFailed(error: Exception) -> bool:
+    """
+    Returns whether `error` is a single-item write whose condition failed.
+    """
+
+    response = getattr(error, "response", {})
+    return response.get("Error", {}).get("Code") == "ConditionalCheckFailedException"
+
+def backoff(attempt: int):
+    """
+    Sleeps before retry number `attempt`, using exponential backoff with full
+    jitter.
+    """
+
+    time.sleep(random.uniform(0, min(batchRetryMaxDelay, batchRetryBaseDelay * (2 ** attempt))))
+
+def __batchGetChunk(tableName: str, keyName: str, keyValues: list, attributeNames: list) -> dict:
+    items = {}
+    requestItems = {
+        tableName: {
+            "Keys": [{keyName: {"S": keyValue}} for keyValue in keyValues]
+        }
+    }
+    if attributeNames:
+        # The key is needed to match items to the requested order
+        requestItems[tableName].update(projection(list(dict.fromkeys([keyName, *attributeNames]))))
+
+    for attempt in range(batchRetryAttempts):
+        if attempt > 0:
+            backoff(attempt)
+
+        response = client.batch_get_item(RequestItems=requestItems)
+        for item in response.get("Responses", {}).get(tableName, []):
+            items[item[keyName]["S"]] = item
+
+        requestItems = response.get("UnprocessedKeys")
+        if not requestItems:
+            return items
+
+    raise Exception(f"Unable to fetch every requested item from {tableName}.")
@@ -0,0 +1,152 @@
+import re
+import base64
+from . import JSON
+
+# Numbers in DynamoDB's wire format that can be copied into JSON as they are
+jsonNumberPattern = re.compile(r"-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?")
+
+def decodeItem(item: dict) -> dict:
+    """
+    Converts an item in DynamoDB's wire format, as returned by the low-level
+    client, straight to JSON-ready Python types.
+
+    Numbers become `int` or `float` rather than `Decimal`, sets become lists
+    and binary values become base64 strings.
+
+    Parameters:
+        item: A dictionary of attribute names to typed attribute values.
+
+    Returns:
+        The item as a plain dictionary.
+    """
+
+    return {name: decodeValue(value) for name, value in item.items()}
+
+def decodeValue(value: dict):
+    """
+    Converts a single typed attribute value to a JSON-ready Python value.
+    """
+
+    (valueType, data), = value.items()
+    if valueType == "S":
+        return data
+    if valueType == "N":
+        return __number(data)
+    if valueType == "M":
+        return {name: decodeValue(member) for name, member in data.items()}
+    if valueType == "L":
+        return [decodeValue(member) for member in data]
+    if valueType == "BOOL":
+        return data
+    if valueType == "NULL":
+        return None
+    if valueType == "SS":
+        return list(data)
+    if valueType == "NS":
+        return [__number(member) for member in data]
+    if valueType == "B":
+        return base64.b64encode(data).decode()
+    if valueType == "BS":
+        return [base64.b64encode(member).decode() for member in data]
+    raise TypeError(f"Unsupported DynamoDB type: {valueType}")
+
+def encodeItem(item: dict) -> dict:
+    """
+    Converts a plain dictionary to DynamoDB's wire format.
+    """
+
+    return {name: encodeValue(value) for name, value in item.items()}
+
+def encodeValue(value) -> dict:
+    """
+    Converts a single Python value to a typed attribute value.
+    """
+
+    if isinstance(value, str):
+        return {"S": value}
+    if isinstance(value, bool):
+        return {"BOOL": value}
+    if isinstance(value, (int, float)):
+        return {"N": str(value)}
+    if value is None:
+        return {"NULL": True}
+    if isinstance(value, dict):
+        return {"M": {name: encodeValue(member) for name, member in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {"L": [encodeValue(member) for member in value]}
+    if isinstance(value, (bytes, bytearray)):
+        return {"B": bytes(value)}
+    if isinstance(value, (set, frozenset)):
+        if all(isinstance(member, str) for member in value):
+            return {"SS": list(value)}
+        return {"NS": [str(member) for member in value]}
+    # Decimal and other numeric types
+    return {"N": str(value)}
+
+def dumpItem(item: dict) -> str:
+    """
+    Serializes an item in DynamoDB's wire format directly to a JSON string,
+    without building an intermediate dictionary. Numbers are copied into the
+    output as they appear on the wire.
+
+    Parameters:
+        item: A dictionary of attribute names to typed attribute values.
+
+    Returns:
+        The item as a JSON object string.
+    """
+
+    parts = []
+    __dumpMap(item, parts)
+    return "".join(parts)
+
+def __dumpMap(data: dict, parts: list):
+    parts.append("{")
+    first = True
+    for name, member in data.items():
+        if not first:
+            parts.append(",")
+        first = False
+        parts.append(JSON.dumps(name))
+        parts.append(":")
+        __dumpValue(member, parts)
+    parts.append("}")
+
+def __dumpList(data: list, parts: list, dumpMember):
+    parts.append("[")
+    first = True
+    for member in data:
+        if not first:
+            parts.append(",")
+        first = False
+        dumpMember(member, parts)
+    parts.append("]")
+
+def __dumpValue(value: dict, parts: list):
+    (valueType, data), = value.items()
+    if valueType == "S":
+        parts.append(JSON.dumps(data))
+    elif valueType == "N":
+        __dumpNumber(data, parts)
+    elif valueType == "M":
+        __dumpMap(data, parts)
+    elif valueType == "L":
+        __dumpList(data, parts, __dumpValue)
+    elif valueType == "SS":
+        __dumpList(data, parts, lambda member, parts: parts.append(JSON.dumps(member)))
+    elif valueType == "NS":
+        __dumpList(data, parts, __dumpNumber)
+    else:
+        parts.append(JSON.dumps(decodeValue(value)))
+
+def __dumpNumber(data: str, parts: list):
+    if jsonNumberPattern.fullmatch(data):
+        parts.append(data)
+    else:
+        parts.append(JSON.dumps(__number(data)))
+
+def __number(data: str):
+    try:
+        return int(data)
+    except ValueError:
+        return float(data)
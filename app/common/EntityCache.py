@@ -0,0 +1,144 @@
+import time
+import threading
+from collections import OrderedDict
+from . import Stats
+
+class EntityCache:
+    """
+    A bounded, per-container read-through cache with a time to live and
+    least-recently-used eviction.
+
+    Writes made by this container invalidate entries directly. Writes made by
+    other containers are picked up once an entry's time to live has elapsed,
+    which bounds how stale a served entry can be.
+
+    Whole entities are cached, and requested fields are selected from them,
+    since a projection does not reduce the cost of a DynamoDB read.
+
+    Every entry carries the version of the cache at the time its value was
+    read. A read that started before an invalidation of the same key is not
+    stored, so a slow read cannot put back the value a write just replaced.
+
+    Every cache reports its counters through `Stats`.
+
+    Attributes:
+        name:
+            Identifies the cache in logs and counters.
+        ttl:
+            Seconds an entry is served for after it was read.
+        maxEntries:
+            The maximum number of entries held. A cache with no capacity
+            stores nothing.
+    """
+
+    def __init__(self, name: str, ttl: float, maxEntries: int):
+        self.name = name
+        self.ttl = ttl
+        self.maxEntries = maxEntries
+        self.__lock = threading.Lock()
+        # key -> (value, version, expiresAt), least recently used first
+        self.__entries = OrderedDict()
+        # key -> version of its latest invalidation, oldest first
+        self.__invalidations = OrderedDict()
+        self.__version = 0
+        self.__stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+            "staleWritesSkipped": 0
+        }
+        Stats.register(f"cache:{name}", self.stats)
+
+    def get(self, key):
+        """
+        Returns the cached value for a key, or `None` if it is not cached or
+        has expired.
+        """
+
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.__stats["misses"] += 1
+                return None
+
+            value, _, expiresAt = entry
+            if expiresAt <= time.monotonic():
+                del self.__entries[key]
+                self.__stats["expirations"] += 1
+                self.__stats["misses"] += 1
+                return None
+
+            self.__entries.move_to_end(key)
+            self.__stats["hits"] += 1
+            return value
+
+    def version(self) -> int:
+        """
+        Returns the current version of the cache. Take it before reading a
+        value from the database, and pass it to `put` along with the value.
+        """
+
+        with self.__lock:
+            return self.__version
+
+    def put(self, key, value, version: int):
+        """
+        Stores a value read from the database.
+
+        Parameters:
+            key: The key of the value.
+            value: The value.
+            version:
+                The version returned by `version` before the value was read.
+                The value is discarded if the key was invalidated since.
+        """
+
+        if self.maxEntries <= 0:
+            return
+
+        with self.__lock:
+            if self.__invalidations.get(key, -1) > version:
+                self.__stats["staleWritesSkipped"] += 1
+                return
+
+            self.__entries[key] = (value, version, time.monotonic() + self.ttl)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.maxEntries:
+                self.__entries.popitem(last=False)
+                self.__stats["evictions"] += 1
+
+    def invalidate(self, *keys):
+        """
+        Removes the values for the given keys, after this container has
+        written them.
+        """
+
+        with self.__lock:
+            self.__version += 1
+            for key in keys:
+                if self.__entries.pop(key, None) is not None:
+                    self.__stats["invalidations"] += 1
+                self.__invalidations[key] = self.__version
+                self.__invalidations.move_to_end(key)
+            # Only recent invalidations matter, since a read in flight ends
+            # long before this many other keys are invalidated
+            while len(self.__invalidations) > max(self.maxEntries, 1):
+                self.__invalidations.popitem(last=False)
+
+    def stats(self) -> dict:
+        """
+        Returns the cache's counters, along with its hit ratio, current size
+        and capacity.
+        """
+
+        with self.__lock:
+            lookups = self.__stats["hits"] + self.__stats["misses"]
+            return {
+                "name": self.name,
+                **self.__stats,
+                "hitRatio": self.__stats["hits"] / lookups if lookups else 0.0,
+                "size": len(self.__entries),
+                "capacity": self.maxEntries
+            }
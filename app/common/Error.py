@@ -5,3 +5,23 @@ class AttributeNotFoundError(Exception):
 
     def __init__(self, attribute):
         super().__init__(f"Attribute {attribute} not found in dictionary")
+
+# An error indicating that a pagination cursor provided by a client could not be decoded.
+class InvalidCursorError(Exception):
+    def __init__(self):
+        super().__init__("The provided cursor is invalid.")
+
+# An error indicating that a write conflicts with existing data, such as a relationship that already exists.
+class ConflictError(Exception):
+    def __init__(self, message="The resource already exists."):
+        super().__init__(message)
+
+# An error indicating that a requested resource does not exist.
+class NotFoundError(Exception):
+    def __init__(self, message="The requested resource does not exist."):
+        super().__init__(message)
+
+# An error indicating that a client requested attributes that do not exist.
+class InvalidFieldsError(Exception):
+    def __init__(self, fields):
+        super().__init__(f"The requested fields are invalid: {', '.join(fields)}")
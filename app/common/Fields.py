@@ -0,0 +1,27 @@
+from . import Error
+
+def parse(fieldsString: str, allowedKeys: list) -> list:
+    """
+    Parses a sparse fieldset requested by a client, such as
+    `fields=username,displayName`.
+
+    Parameters:
+        fieldsString: The comma-separated attribute names, or `None`.
+        allowedKeys: The attribute names that may be requested.
+
+    Returns:
+        The requested attribute names without duplicates, or `None` if no
+        fieldset was requested (all attributes are returned).
+
+    Raises:
+        Error.InvalidFieldsError: An attribute name is not in `allowedKeys`.
+    """
+
+    if not fieldsString:
+        return None
+
+    fields = list(dict.fromkeys(field.strip() for field in fieldsString.split(",") if field.strip()))
+    unknown = [field for field in fields if field not in allowedKeys]
+    if unknown or not fields:
+        raise Error.InvalidFieldsError(unknown)
+    return fields
@@ -4,10 +4,15 @@ standardHTTPResponseHeaders = {
 }
 
 statusOK = 200
+statusNotModified = 304
 statusBadRequest = 400
 statusUnauthorized = 401
+statusForbidden = 403
+statusNotFound = 404
+statusConflict = 409
 statusInternalError = 500
 statusNotImplemented = 501
+statusGatewayTimeout = 504
 
 # HTTP methods
 methodGET = "GET"
@@ -0,0 +1,160 @@
+import os
+import time
+import random
+import threading
+from urllib.parse import urlsplit, urlunsplit
+from . import Stats
+
+# Default deadlines, in seconds
+connectTimeout = float(os.environ.get('OUTBOUND_CONNECT_TIMEOUT', 2))
+readTimeout = float(os.environ.get('OUTBOUND_READ_TIMEOUT', 5))
+
+# Connections kept open per host
+poolSize = int(os.environ.get('OUTBOUND_POOL_SIZE', 10))
+
+# Points every outbound request at another scheme and host, such as a local
+# stub server, when set
+baseURL = os.environ.get('OUTBOUND_BASE_URL')
+
+# Retries. Each request adds `retryBudgetRatio` to the budget (up to
+# `retryBudgetMax`) and each retry spends 1, so retries stay a bounded
+# fraction of traffic when a dependency is failing.
+maxRetries = 2
+retryBudgetRatio = 0.1
+retryBudgetMax = 10.0
+retryBaseDelay = 0.1
+retryMaxDelay = 1.0
+retryStatusCodes = {429, 500, 502, 503, 504}
+
+__lock = threading.Lock()
+__sessions = {}
+__retryBudget = retryBudgetMax
+__stats = {
+    "requests": 0,
+    "retries": 0,
+    "retriesDenied": 0,
+    "errors": 0
+}
+
+def get(url: str, timeout=None, retry: bool = True, **kwargs):
+    """
+    Sends a GET request. See `request`.
+    """
+
+    return request("GET", url, timeout=timeout, retry=retry, **kwargs)
+
+def post(url: str, timeout=None, retry: bool = False, **kwargs):
+    """
+    Sends a POST request. POST requests are not retried unless `retry` is set,
+    because they may not be idempotent. See `request`.
+    """
+
+    return request("POST", url, timeout=timeout, retry=retry, **kwargs)
+
+def request(method: str, url: str, timeout=None, retry: bool = True, **kwargs):
+    """
+    Sends a request over a pooled, kept-alive connection to the URL's host.
+
+    Failed connections and retryable responses (429 and 5xx) are retried
+    with exponential backoff and jitter, while the retry budget allows it.
+
+    Parameters:
+        method: The HTTP method.
+        url: The URL, which is rewritten to `baseURL` if one is set.
+        timeout:
+            The deadline for this call, as seconds or a `(connect, read)`
+            tuple. Defaults to `(connectTimeout, readTimeout)`.
+        retry: Whether the request may be retried.
+        kwargs: Passed on to `requests.Session.request`.
+
+    Returns:
+        The `requests.Response`.
+    """
+
+    url = __rewrite(url)
+    session = __sessionFor(url)
+    timeout = timeout if timeout is not None else (connectTimeout, readTimeout)
+    __deposit()
+
+    attempt = 0
+    while True:
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+            if not (retry and response.status_code in retryStatusCodes and __canRetry(attempt)):
+                return response
+            response.close()
+        except Exception:
+            if not (retry and __canRetry(attempt)):
+                __stats["errors"] += 1
+                raise
+
+        attempt += 1
+        __stats["retries"] += 1
+        time.sleep(random.uniform(0, min(retryMaxDelay, retryBaseDelay * (2 ** attempt))))
+
+def setBaseURL(url: str):
+    """
+    Points every outbound request at another scheme and host, or restores the
+    original URLs if `url` is `None`.
+    """
+
+    global baseURL
+    baseURL = url
+
+def stats() -> dict:
+    """
+    Returns the client's counters, along with the number of pooled hosts and
+    the remaining retry budget.
+    """
+
+    return {
+        **__stats,
+        "hosts": len(__sessions),
+        "retryBudget": __retryBudget
+    }
+
+def __sessionFor(url: str):
+    host = urlsplit(url).netloc
+    session = __sessions.get(host)
+    if session is not None:
+        return session
+
+    with __lock:
+        session = __sessions.get(host)
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=poolSize, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            __sessions[host] = session
+        return session
+
+def __rewrite(url: str) -> str:
+    if not baseURL:
+        return url
+    base = urlsplit(baseURL)
+    parts = urlsplit(url)
+    path = base.path.rstrip("/") + parts.path
+    return urlunsplit((base.scheme, base.netloc, path, parts.query, parts.fragment))
+
+def __deposit():
+    global __retryBudget
+    with __lock:
+        __stats["requests"] += 1
+        __retryBudget = min(retryBudgetMax, __retryBudget + retryBudgetRatio)
+
+def __canRetry(attempt: int) -> bool:
+    global __retryBudget
+    if attempt >= maxRetries:
+        return False
+    with __lock:
+        if __retryBudget < 1:
+            __stats["retriesDenied"] += 1
+            return False
+        __retryBudget -= 1
+        return True
+
+Stats.register("httpClient", stats)
@@ -0,0 +1,57 @@
+import json
+import functools
+from decimal import Decimal
+
+# orjson is used when it is installed, the standard library otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+backend = "orjson" if orjson is not None else "json"
+
+def dumps(value) -> str:
+    """
+    Serializes a value to a compact JSON string.
+
+    `Decimal` values become integers when they are whole and floats
+    otherwise. Sets become lists.
+
+    Parameters:
+        value: The value to serialize.
+
+    Returns:
+        The JSON string.
+    """
+
+    if orjson is not None:
+        return orjson.dumps(value, default=__default).decode()
+    return json.dumps(value, default=__default, separators=(",", ":"), ensure_ascii=False)
+
+def loads(data):
+    """
+    Deserializes a JSON string or bytes.
+
+    Raises:
+        ValueError: The data is not valid JSON.
+    """
+
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+@functools.lru_cache(maxsize=256)
+def message(text: str) -> str:
+    """
+    Returns the body of a response that carries only a message, such as an
+    error. Bodies are cached, so constant messages are only serialized once.
+    """
+
+    return dumps({"message": text})
+
+def __default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value.is_finite() and value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,308 @@
+import time
+import base64
+import hashlib
+import functools
+from . import HTTP, Event, Error, JSON, Compression
+
+def staticResponse(statusCode: int, message: str):
+    """
+    Returns a callable that creates an error response whose body never
+    changes. The body is serialized once, when the callable is created.
+    """
+
+    body = JSON.message(message)
+    return lambda: HTTP.response(statusCode, dict(HTTP.standardHTTPResponseHeaders), body)
+
+notImplementedResponse = staticResponse(HTTP.statusNotImplemented, "The requested method has not been implemented.")
+emptyBodyResponse = staticResponse(HTTP.statusBadRequest, "Request body is empty.")
+
+class Request:
+    """
+    An HTTP request, as handed to routes.
+
+    Attributes:
+        method:
+            The HTTP method.
+        path:
+            The request path.
+        headers:
+            The request headers, or an empty dictionary.
+        queryParams:
+            The query parameters the route expects, or an empty dictionary.
+        body:
+            The decoded JSON body, if the route parses the body.
+        subject:
+            The unique identifier of the authenticated user, if the route
+            requires authentication.
+        event:
+            The Lambda event the request was read from.
+    """
+
+    def __init__(self, event: dict):
+        self.event = event
+        self.method = event.get(Event.httpMethodKey) or ""
+        self.path = event.get(Event.pathKey) or ""
+        self.headers = event.get(Event.httpHeadersKey) or {}
+        self.queryParams = event.get(Event.queryParamsKey) or {}
+        self.body = None
+        self.subject = None
+
+    def header(self, name: str) -> str:
+        """
+        Returns the value of a request header, matching its name without
+        regard to case, or `None` if the header is missing.
+        """
+
+        value = self.headers.get(name)
+        if value is not None:
+            return value
+        name = name.lower()
+        for key, value in self.headers.items():
+            if key.lower() == name:
+                return value
+        return None
+
+class Route:
+    """
+    A handler for one method and path, along with the middleware that runs
+    around it. The middleware chain is composed once, when the route is
+    created.
+
+    Attributes:
+        method:
+            The HTTP method.
+        path:
+            The request path.
+        handler:
+            A callable that takes a `Request` and returns a response.
+        call:
+            The handler wrapped in its middleware.
+    """
+
+    def __init__(self, method: str, path: str, handler, middleware: list):
+        self.method = method
+        self.path = path
+        self.handler = handler
+        self.call = handler
+        for layer in reversed(middleware):
+            self.call = functools.partial(layer, handler=self.call)
+
+class Router:
+    """
+    Maps each method and path to a route in a single lookup.
+
+    Attributes:
+        authenticator:
+            The middleware that runs on routes requiring authentication. It
+            sets the request's `subject` or returns an error response.
+        routes:
+            The routes, by method and path.
+    """
+
+    def __init__(self, authenticator):
+        self.authenticator = authenticator
+        self.routes = {}
+
+    def add(self, method: str, path: str, handler, auth: bool = True, body: bool = False, queryParams: list = (), required: list = (), middleware: list = ()):
+        """
+        Adds a route.
+
+        Parameters:
+            method:
+                The HTTP method.
+            path:
+                The request path.
+            handler:
+                A callable that takes a `Request` and returns a response.
+            auth:
+                Whether the request must carry a valid access token.
+            body:
+                Whether the request body is decoded from JSON. A missing or
+                malformed body is rejected before the handler runs.
+            queryParams:
+                The query parameters the handler reads. Other parameters are
+                dropped.
+            required:
+                The query parameters that must be present and not empty.
+            middleware:
+                Callables that take a `Request` and the next `handler` in the
+                chain, and return a response. They run in order, outermost
+                first, before authentication and body parsing.
+        """
+
+        layers = list(middleware)
+        if auth:
+            layers.append(self.authenticator)
+        layers.append(functools.partial(parseQueryParams, expected=frozenset(queryParams) | frozenset(required), missing=[
+            (name, staticResponse(HTTP.statusBadRequest, f"The request is missing the required `{name}` parameter."))
+            for name in required
+        ]))
+        if body:
+            layers.append(parseBody)
+
+        self.routes[(method, path)] = Route(method, path, handler, layers)
+
+    def dispatch(self, event: dict) -> dict:
+        """
+        Passes the request described by a Lambda event to its route.
+
+        Returns:
+            The route's response, or a 501 response if no route matches the
+            method and path.
+        """
+
+        request = Request(event)
+        route = self.routes.get((request.method, request.path))
+        if route is None:
+            return notImplementedResponse()
+        return route.call(request)
+
+# Middleware
+def timing(request: Request, handler) -> dict:
+    """
+    Logs the route, status code and duration of the request.
+    """
+
+    start = time.perf_counter()
+    response = handler(request)
+    print(JSON.dumps({
+        "route": f"{request.method} {request.path}",
+        "status": response.get("statusCode") if response else None,
+        "milliseconds": round((time.perf_counter() - start) * 1000, 3)
+    }))
+    return response
+
+def mapErrors(request: Request, handler) -> dict:
+    """
+    Turns errors raised by the handler into error responses.
+    """
+
+    try:
+        return handler(request)
+    except (Error.InvalidCursorError, Error.InvalidFieldsError) as error:
+        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, JSON.message(str(error)))
+    except Error.NotFoundError as error:
+        return HTTP.response(HTTP.statusNotFound, HTTP.standardHTTPResponseHeaders, JSON.message(str(error)))
+    except Error.ConflictError as error:
+        return HTTP.response(HTTP.statusConflict, HTTP.standardHTTPResponseHeaders, JSON.message(str(error)))
+    except Exception as error:
+        print(error)
+        return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, JSON.message(str(error)))
+
+def compress(request: Request, handler) -> dict:
+    """
+    Compresses response bodies of at least `Compression.minimumSize` bytes
+    with an encoding the client accepts. Compressed bodies are base64-encoded
+    and flagged with `isBase64Encoded`, as API Gateway requires.
+    """
+
+    response = handler(request)
+    if not response or not isinstance(response.get("body"), str):
+        return response
+
+    data = response["body"].encode()
+    if len(data) < Compression.minimumSize:
+        return response
+
+    headers, encoding = __encodingHeaders(request, response["headers"], len(data))
+    if encoding is None:
+        return HTTP.response(response["statusCode"], headers, response["body"])
+
+    headers["Content-Encoding"] = encoding
+    compressed = HTTP.response(response["statusCode"], headers, base64.b64encode(Compression.compress(data, encoding)).decode())
+    compressed["isBase64Encoded"] = True
+    return compressed
+
+def conditional(cacheControl: str, vary: list = ()):
+    """
+    Returns middleware that tags successful responses with a strong `ETag`,
+    computed from a hash of the body, and the given `Cache-Control`. A
+    request whose `If-None-Match` lists the current tag receives a 304
+    response without a body. The 304 carries the `ETag` and `Vary` headers
+    that `compress` would give the full response.
+
+    Parameters:
+        cacheControl: The `Cache-Control` header of the route's responses.
+        vary:
+            The request headers that caches must key the route's responses
+            on, such as `Authorization` for routes that require
+            authentication.
+    """
+
+    def middleware(request: Request, handler) -> dict:
+        response = handler(request)
+        if not response or response.get("statusCode") != HTTP.statusOK or not isinstance(response.get("body"), str):
+            return response
+
+        etag = '"' + hashlib.blake2b(response["body"].encode(), digest_size=16).hexdigest() + '"'
+        headers = {**response["headers"], "ETag": etag, "Cache-Control": cacheControl}
+        for name in vary:
+            headers = __addVary(headers, name)
+        if __matches(request.header("If-None-Match"), etag):
+            headers, _ = __encodingHeaders(request, headers, len(response["body"].encode()))
+            return HTTP.response(HTTP.statusNotModified, headers, "")
+        return HTTP.response(response["statusCode"], headers, response["body"])
+
+    return middleware
+
+def parseQueryParams(request: Request, handler, expected: frozenset, missing: list) -> dict:
+    """
+    Drops the query parameters the route does not expect, and rejects the
+    request if a required parameter is missing.
+
+    Parameters:
+        expected: The names of the parameters the route reads.
+        missing: Pairs of a required parameter name and the response to return without it.
+    """
+
+    request.queryParams = {name: value for name, value in request.queryParams.items() if name in expected}
+    for name, response in missing:
+        if not request.queryParams.get(name):
+            return response()
+    return handler(request)
+
+def parseBody(request: Request, handler) -> dict:
+    """
+    Decodes the JSON request body into the request's `body`.
+    """
+
+    bodyString = request.event.get(Event.httpBodyKey)
+    if not bodyString:
+        return emptyBodyResponse()
+
+    try:
+        request.body = JSON.loads(bodyString)
+    except Exception as error:
+        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, JSON.message(f"Could not decode the request body. {str(error)}"))
+
+    return handler(request)
+
+def __encodingHeaders(request: Request, headers: dict, size: int) -> tuple:
+    # Returns the headers of a response whose body is `size` bytes, as
+    # `compress` sends it, and the encoding the body is compressed with
+    if size < Compression.minimumSize:
+        return headers, None
+
+    # Caches must key large responses on the encodings a client accepts
+    headers = __addVary(headers, "Accept-Encoding")
+    encoding = Compression.negotiate(request.header("Accept-Encoding"))
+    # The compressed bytes are not the ones the strong tag was computed from
+    if encoding is not None and headers.get("ETag", "").startswith('"'):
+        headers["ETag"] = "W/" + headers["ETag"]
+    return headers, encoding
+
+def __addVary(headers: dict, name: str) -> dict:
+    vary = [value.strip() for value in headers.get("Vary", "").split(",") if value.strip()]
+    if name not in vary:
+        vary.append(name)
+    return {**headers, "Vary": ", ".join(vary)}
+
+def __matches(ifNoneMatch: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    if not ifNoneMatch:
+        return False
+    for tag in ifNoneMatch.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
@@ -0,0 +1,136 @@
+import os
+import sys
+import json
+import time
+import importlib
+import importlib.util
+import threading
+
+# Release identifier attached to reported timings
+releaseVersion = os.environ.get('AWS_LAMBDA_FUNCTION_VERSION', '$LATEST')
+
+__containerStart = time.perf_counter()
+__lock = threading.Lock()
+__timings = {}
+__unreported = {}
+__coldStart = True
+
+class Lazy:
+    """
+    A value that is created on first use and shared after that.
+
+    Attribute access is forwarded to the value, so a `Lazy` can stand in for
+    a module, client or table at module level without creating it at import
+    time.
+
+    Attributes:
+        name:
+            The name under which the time taken to create the value is recorded.
+        factory:
+            A callable that creates the value.
+    """
+
+    def __init__(self, name: str, factory):
+        self.name = name
+        self.factory = factory
+        self.__value = None
+        self.__lock = threading.Lock()
+
+    def get(self):
+        """
+        Returns the value, creating it if this is the first use.
+        """
+
+        value = self.__value
+        if value is not None:
+            return value
+
+        with self.__lock:
+            if self.__value is None:
+                start = time.perf_counter()
+                self.__value = self.factory()
+                record(self.name, time.perf_counter() - start)
+            return self.__value
+
+    def reset(self):
+        """
+        Discards the value, so that it is created again on next use.
+        """
+
+        with self.__lock:
+            self.__value = None
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+def lazyModule(name: str, package: str = None) -> Lazy:
+    """
+    Returns a stand-in for a module that is imported on first attribute access.
+
+    Parameters:
+        name: The module name, which may be relative to `package`.
+        package: The package that relative module names are resolved against.
+    """
+
+    fullName = importlib.util.resolve_name(name, package)
+    return Lazy(f"import:{fullName}", lambda: load(fullName))
+
+def load(name: str, package: str = None):
+    """
+    Imports a module, recording the time taken by the first import.
+    """
+
+    fullName = importlib.util.resolve_name(name, package)
+    module = sys.modules.get(fullName)
+    if module is not None:
+        return module
+
+    start = time.perf_counter()
+    module = importlib.import_module(fullName)
+    record(f"import:{fullName}", time.perf_counter() - start)
+    return module
+
+def record(name: str, seconds: float):
+    """
+    Records the time taken to import or initialize something. Only the first
+    recording for each name is kept.
+    """
+
+    with __lock:
+        if name not in __timings:
+            __timings[name] = seconds
+            __unreported[name] = seconds
+
+def timings() -> dict:
+    """
+    Returns every recorded import and initialization time, in seconds.
+    """
+
+    return dict(__timings)
+
+def report():
+    """
+    Logs the timings recorded since the last report, if there are any. The
+    first report of a container also includes the time elapsed since the
+    container started loading the function.
+    """
+
+    global __unreported, __coldStart
+
+    if not __unreported:
+        return
+
+    with __lock:
+        unreported = __unreported
+        __unreported = {}
+        coldStart = __coldStart
+        __coldStart = False
+
+    entry = {
+        "release": releaseVersion,
+        "coldStart": coldStart,
+        "timings": {name: round(seconds * 1000, 3) for name, seconds in unreported.items()}
+    }
+    if coldStart:
+        entry["sinceContainerStart"] = round((time.perf_counter() - __containerStart) * 1000, 3)
+    print(json.dumps({"startup": entry}))
@@ -0,0 +1,55 @@
+import os
+import time
+import threading
+from . import JSON
+
+# Seconds between reports of the counters. A container that serves many
+# requests logs them once per interval rather than with every request.
+reportInterval = float(os.environ.get('STATS_REPORT_INTERVAL', 60))
+
+__lock = threading.Lock()
+__providers = {}
+__lastReport = None
+
+def register(name: str, provider):
+    """
+    Adds a source of counters to the reports, such as a cache's `stats`.
+    Subsystems register when they are first loaded, so only the ones a
+    container has used are reported.
+
+    Parameters:
+        name: Identifies the counters in reports.
+        provider: A callable that returns a dictionary of counters.
+    """
+
+    with __lock:
+        __providers[name] = provider
+
+def snapshot() -> dict:
+    """
+    Returns the current counters of every registered source, by name.
+    """
+
+    with __lock:
+        providers = dict(__providers)
+    return {name: provider() for name, provider in providers.items()}
+
+def report():
+    """
+    Logs the counters of every registered source, if `reportInterval`
+    seconds have passed since the last report. The first call of a
+    container only starts the interval.
+    """
+
+    global __lastReport
+
+    now = time.monotonic()
+    with __lock:
+        if __lastReport is None:
+            __lastReport = now
+            return
+        if now - __lastReport < reportInterval:
+            return
+        __lastReport = now
+
+    print(JSON.dumps({"stats": snapshot()}))
@@ -1,22 +1,60 @@
-import json
-from .common import HTTP, Event
-from .auth import AuthenticationManager
-from .user import UserManager
-from .access import AccessManager
-import requests
-from .post import PostManager
+import os
+from .common import HTTP, Startup, Stats, Error, Router, JSON
 from .access.models.AccessToken import AccessToken
-import jwt
+
+# Subsystems are imported on first use, so each route only loads what it touches
+AuthenticationManager = Startup.lazyModule(".auth.AuthenticationManager", __package__)
+UserManager = Startup.lazyModule(".user.UserManager", __package__)
+AccessManager = Startup.lazyModule(".access.AccessManager", __package__)
+PostManager = Startup.lazyModule(".post.PostManager", __package__)
+jwt = Startup.lazyModule("jwt")
 
 authFunctionPath = "/auth"
 tokenFunctionPath = "/auth/token"
 userFunctionPath = "/user"
 userIDFunctionPath = "/userID"
 postFunctionPath = "/post"
+timelineFunctionPath = "/timeline"
+followFunctionPath = "/user/follow"
+followersFunctionPath = "/user/followers"
+followingFunctionPath = "/user/following"
+userPostsFunctionPath = "/user/posts"
+
+# Relation listed by each of the /user list paths (see `Graph.relations`)
+relationFunctionPaths = {
+    followersFunctionPath: "follower",
+    followingFunctionPath: "following",
+    userPostsFunctionPath: "post"
+}
 
 # Query Params
 userIDKey = "userID"
+userIDsKey = "userIDs"
 usernameKey = "username"
+usernamesKey = "usernames"
+postIDKey = "postID"
+postIDsKey = "postIDs"
+limitKey = "limit"
+cursorKey = "cursor"
+fieldsKey = "fields"
+
+# Maximum number of posts / users that may be fetched by a single request
+maxPostIDs = 500
+maxUserIDs = 500
+maxUsernames = 100
+
+# Timeline and list page sizes
+defaultTimelineLimit = 20
+maxTimelineLimit = 100
+defaultListLimit = 50
+maxListLimit = 500
+
+# Cache-Control of user and post reads, which lets CloudFront or API Gateway 
+# cache them and clients revalidate them with If-None-Match. These reads 
+# require authentication, so responses carry `Vary: Authorization` and a 
+# shared cache must include the Authorization header in its cache key.
+userCacheControl = os.environ.get('USER_CACHE_CONTROL', 'public, max-age=30')
+postCacheControl = os.environ.get('POST_CACHE_CONTROL', 'public, max-age=300')
 
 def lambda_handler(event, context):
     """
@@ -30,68 +68,27 @@ def lambda_handler(event, context):
         Dictionary representation of an HTTP response.
     """
 
-    # Get info about the request from the event
-    httpMethod = event.get(Event.httpMethodKey, "")
-    headers = event.get(Event.httpHeadersKey)
-    path = event.get(Event.pathKey, "")
-    queryParams = event.get(Event.queryParamsKey)
-
-    # /auth ANY
-    if path == authFunctionPath:
-        authData = __getBody(event)
-        return authHandler(httpMethod, authData)
-    # /auth/token ANY
-    elif path == tokenFunctionPath:
-        tokenData = __getBody(event)
-        return tokenHandler(httpMethod, tokenData)
-    else:
-        # Validate access token
-        try:
-            accessTokenString = __getTokenFromAuthorizationHeader(headers)
-            accessToken = __verify(accessTokenString)
-        except jwt.ExpiredSignatureError:
-            return HTTP.response(HTTP.statusUnauthorized, HTTP.standardHTTPResponseHeaders, json.dumps({"message":"The access token has expired."}))
-        except Exception as error:
-            return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, json.dumps({"message":str(error)}))
-        
-        # /user
-        if path == userFunctionPath:
-            # GET
-            if httpMethod == HTTP.methodGET:
-                return fetchUser(queryParams)
-            # POST
-            elif httpMethod == HTTP.methodPOST:
-                userData = __getBody(event)
-                return createUser(userData)
-            # PUT
-            elif httpMethod == HTTP.methodPUT:
-                userData = __getBody(event)
-                return updateUser(userData)
-        # /userID
-        elif path == userIDFunctionPath:
-            # GET
-            if httpMethod == HTTP.methodGET:
-                return fetchUserID(queryParams)
-            # POST
-            elif httpMethod == HTTP.methodPOST:
-                return
-        # /post
-        elif path == postFunctionPath:
-            # POST
-            if httpMethod == HTTP.methodPOST:
-                postData = __getBody(event)
-                return publishPost(postData)
-            # GET
-            elif httpMethod == HTTP.methodGET:
-                return fetchPost(queryParams)
-            # DELETE
-            elif httpMethod == HTTP.methodDELETE:
-                return deletePost(queryParams, accessToken.subject)
-
-        # Not implemented
-        return HTTP.response(HTTP.statusNotImplemented, HTTP.standardHTTPResponseHeaders, json.dumps({"message":"The requested method has not been implemented."}))
-        
+    response = router.dispatch(event)
+    # Log any import and initialization timings recorded by this invocation
+    Startup.report()
+    # Log cache and client counters, at most once per `Stats.reportInterval`
+    Stats.report()
+    return response
+
 # API Access
+def __authenticate(request: Router.Request, handler) -> dict:
+    # Validates the access token and records the authenticated user
+    try:
+        accessTokenString = __getTokenFromAuthorizationHeader(request.headers)
+        accessToken = __verify(accessTokenString)
+    except jwt.ExpiredSignatureError:
+        return expiredTokenResponse()
+    except Exception as error:
+        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, JSON.message(str(error)))
+
+    request.subject = accessToken.subject
+    return handler(request)
+
 def __getTokenFromAuthorizationHeader(headers: dict) -> str:
     try:
         # Get token from authorization header
@@ -115,111 +112,198 @@ def __verify(tokenString: str) -> AccessToken:
     except:
         raise Exception("There was a problem while validating the provided access token.")
 
+expiredTokenResponse = Router.staticResponse(HTTP.statusUnauthorized, "The access token has expired.")
+
 # Function-specific handlers:
-# /auth ANY
-def authHandler(httpMethod, authData):
-    if httpMethod == HTTP.methodPOST:
-        return AuthenticationManager.authenticate(authData)
-    else:
-        # HTTP method is not implemented
-        return HTTP.response(HTTP.statusNotImplemented, HTTP.standardHTTPResponseHeaders, json.dumps({"message":"The requested method has not been implemented."}))
+# /auth POST
+def authHandler(request: Router.Request) -> dict:
+    return AuthenticationManager.authenticate(request.body)
     
-# /auth/token ANY
-def tokenHandler(httpMethod: str, tokenData: dict) -> requests.Response:
-    if httpMethod != HTTP.methodPOST:
-        # HTTP method is not implemented
-        return HTTP.response(HTTP.statusNotImplemented, HTTP.standardHTTPResponseHeaders, json.dumps({"message":"The requested method has not been implemented."}))
-
+# /auth/token POST
+def tokenHandler(request: Router.Request) -> dict:
     try:
-        token = tokenData["refreshToken"]
+        token = request.body["refreshToken"]
         accessData = AccessManager.exchange(token)
-        return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, json.dumps(accessData.json()))
-    except KeyError:
-        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, json.dumps({"message":"The request body is missing the required attribute: `refreshToken`."}))
+        return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, JSON.dumps(accessData.json()))
+    except (KeyError, TypeError):
+        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, JSON.message("The request body is missing the required attribute: `refreshToken`."))
     except Exception as error:
-        return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, json.dumps({"message":str(error)}))
+        return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, JSON.message(str(error)))
 
 # /user GET
-def fetchUser(queryParams):
+def fetchUser(request: Router.Request) -> dict:
+    queryParams = request.queryParams
+    # Many users may be requested at once as a comma-separated list
+    if queryParams.get(userIDsKey):
+        return fetchUsers(request)
+
     userID = queryParams.get(userIDKey)
-    if userID is None or userID == "":
-        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, json.dumps({"message":"The request is missing the required `userID` parameter."}))
+    if not userID:
+        return missingUserIDResponse()
     else:
-        return UserManager.getUser(userID)
+        return UserManager.getUser(userID, queryParams.get(fieldsKey))
+        
+# /user GET (many)
+def fetchUsers(request: Router.Request) -> dict:
+    userIDs = [userID for userID in request.queryParams[userIDsKey].split(",") if userID]
+    if len(userIDs) == 0 or len(userIDs) > maxUserIDs:
+        return tooManyUserIDsResponse()
+
+    return UserManager.getUserCards(userIDs, request.queryParams.get(fieldsKey))
         
 # /user POST
-def createUser(userData):
-    return UserManager.createUser(userData)
+def createUser(request: Router.Request) -> dict:
+    return UserManager.createUser(request.body)
     
 # /user PUT
-def updateUser(userData):
-    return UserManager.updateUser(userData)
+def updateUser(request: Router.Request) -> dict:
+    return UserManager.updateUser(request.body)
     
 # /userID GET
-def fetchUserID(queryParams):
-    username = queryParams.get(usernameKey)
-    if username is None or username == "":
-        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, json.dumps({"message":"The request is missing the required `userID` parameter."}))
-    else:
-        try:
-            userID = UserManager.exchangeUsernameForUserID(username)
-            response = { "user ID": userID }
-            return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, json.dumps(response))
-        except Exception as e:
-            return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, json.dumps({"message":f"There was a problem while attempting to exchange the user ID for username. {e}"}))
-            
-# /userID POST
-def registerUsername(queryParams):
-    pass
+def fetchUserID(request: Router.Request) -> dict:
+    # Many usernames may be resolved at once as a comma-separated list
+    if request.queryParams.get(usernamesKey):
+        return fetchUserIDs(request)
+
+    username = request.queryParams.get(usernameKey)
+    if not username:
+        return missingUsernameResponse()
+
+    try:
+        userID = UserManager.exchangeUsernameForUserID(username)
+        response = { "user ID": userID }
+        return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, JSON.dumps(response))
+    except Error.NotFoundError as e:
+        return HTTP.response(HTTP.statusNotFound, HTTP.standardHTTPResponseHeaders, JSON.message(str(e)))
+    except Exception as e:
+        return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, JSON.message(f"There was a problem while attempting to exchange the user ID for username. {e}"))
+
+# /userID GET (many)
+def fetchUserIDs(request: Router.Request) -> dict:
+    usernames = [username for username in request.queryParams[usernamesKey].split(",") if username]
+    if len(usernames) == 0 or len(usernames) > maxUsernames:
+        return tooManyUsernamesResponse()
+
+    userIDs, missing = UserManager.exchangeUsernamesForUserIDs(usernames)
+    return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, JSON.dumps({"userIDs": userIDs, "missing": missing}))
 
 # /post POST
-def publishPost(postData: dict) -> requests.Response:
+def publishPost(request: Router.Request) -> dict:
+    # Users may only publish their own posts
+    if not isinstance(request.body, dict) or request.body.get("author") != request.subject:
+        return forbiddenAuthorResponse()
+
     try:
-        PostManager.publish(postData)
+        PostManager.publish(request.body)
+    except Error.ConflictError as error:
+        return HTTP.response(HTTP.statusConflict, HTTP.standardHTTPResponseHeaders, JSON.message(str(error)))
     except Exception as error:
-        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, json.dumps({"message":str(error)}))
+        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, JSON.message(str(error)))
     
     return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, "")
 
 # /post GET
-def fetchPost(queryParams) -> requests.Response:
+def fetchPost(request: Router.Request) -> dict:
+    queryParams = request.queryParams
+    # Many posts may be requested at once as a comma-separated list
+    if queryParams.get(postIDsKey):
+        return fetchPosts(request)
+
     try:
         # get post identifier from query parameters
-        postID = queryParams.get("postID")
+        postID = queryParams.get(postIDKey)
         if postID is None or postID == "":
             raise Exception("Invalid postID.")
         
         # fetch the post
-        postData = PostManager.fetch(postID)
+        postData = PostManager.fetch(postID, queryParams.get(fieldsKey))
     except Exception as error:
-        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, json.dumps({"message":str(error)}))
+        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, JSON.message(str(error)))
     
-    return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, json.dumps(postData))
+    return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, JSON.dumps(postData))
+
+# /post GET (many)
+def fetchPosts(request: Router.Request) -> dict:
+    postIDs = [postID for postID in request.queryParams[postIDsKey].split(",") if postID]
+    if len(postIDs) == 0 or len(postIDs) > maxPostIDs:
+        return tooManyPostIDsResponse()
+
+    posts, missing = PostManager.fetchMany(postIDs, request.queryParams.get(fieldsKey))
+    return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, JSON.dumps({"posts": posts, "missing": missing}))
 
 # /post DELETE
-def deletePost(queryParams, userID) -> requests.Response:
+def deletePost(request: Router.Request) -> dict:
     try:
-        # get post identifier from query parameters
-        postID = queryParams.get("postID")
-        if postID is None or postID == "":
-            raise Exception("Invalid postID.")
-        
-        # delete the post
-        PostManager.delete(postID, userID)
+        PostManager.delete(request.queryParams[postIDKey], request.subject)
     except:
-        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, json.dumps({"message":"Unable to delete post."}))
+        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, JSON.message("Unable to delete post."))
     
     return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, "")
 
-# Extracts http request body from event
-def __getBody(event):
-    bodyString = event.get(Event.httpBodyKey)
-    if not bodyString:
-        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, json.dumps({"message": "Request body is empty."}))
-        
+# /timeline GET
+def fetchTimeline(request: Router.Request) -> dict:
+    limit = __limit(request.queryParams, defaultTimelineLimit, maxTimelineLimit)
+    if limit is None:
+        return invalidTimelineLimitResponse()
+
     try:
-        bodyObject = json.loads(bodyString)
-    except Exception as e:
-        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, json.dumps({"message":f"Could not decode the request body. {str(e)}"}))
-        
-    return bodyObject
+        timeline = PostManager.timeline(request.subject, limit, request.queryParams.get(cursorKey))
+    except Error.InvalidCursorError as error:
+        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, JSON.message(str(error)))
+    except Exception as error:
+        return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, JSON.message(f"A problem ocurred while attempting to retrieve the timeline. {error}"))
+
+    return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, JSON.dumps(timeline))
+
+# /user/follow POST
+def followUser(request: Router.Request) -> dict:
+    return UserManager.follow(request.subject, request.queryParams[userIDKey])
+
+# /user/follow DELETE
+def unfollowUser(request: Router.Request) -> dict:
+    return UserManager.unfollow(request.subject, request.queryParams[userIDKey])
+
+# /user/followers, /user/following, /user/posts GET
+def fetchRelations(request: Router.Request) -> dict:
+    limit = __limit(request.queryParams, defaultListLimit, maxListLimit)
+    if limit is None:
+        return invalidListLimitResponse()
+
+    return UserManager.getRelations(request.queryParams[userIDKey], relationFunctionPaths[request.path], limit, request.queryParams.get(cursorKey))
+
+# Reads the `limit` query parameter, returning `None` if it is out of range
+def __limit(queryParams: dict, default: int, maximum: int):
+    try:
+        limit = int(queryParams.get(limitKey) or default)
+    except ValueError:
+        return None
+    return limit if 1 <= limit <= maximum else None
+
+# Static error responses
+missingUserIDResponse = Router.staticResponse(HTTP.statusBadRequest, "The request is missing the required `userID` parameter.")
+tooManyUserIDsResponse = Router.staticResponse(HTTP.statusBadRequest, f"Between 1 and {maxUserIDs} user IDs may be requested at once.")
+missingUsernameResponse = Router.staticResponse(HTTP.statusBadRequest, "The request is missing the required `username` parameter.")
+tooManyUsernamesResponse = Router.staticResponse(HTTP.statusBadRequest, f"Between 1 and {maxUsernames} usernames may be resolved at once.")
+forbiddenAuthorResponse = Router.staticResponse(HTTP.statusForbidden, "The post's author must be the authenticated user.")
+tooManyPostIDsResponse = Router.staticResponse(HTTP.statusBadRequest, f"Between 1 and {maxPostIDs} post IDs may be requested at once.")
+invalidTimelineLimitResponse = Router.staticResponse(HTTP.statusBadRequest, f"The `limit` parameter must be between 1 and {maxTimelineLimit}.")
+invalidListLimitResponse = Router.staticResponse(HTTP.statusBadRequest, f"The `limit` parameter must be between 1 and {maxListLimit}.")
+
+# Routes
+standardMiddleware = [Router.timing, Router.compress, Router.mapErrors]
+
+router = Router.Router(authenticator=__authenticate)
+router.add(HTTP.methodPOST, authFunctionPath, authHandler, auth=False, body=True, middleware=standardMiddleware)
+router.add(HTTP.methodPOST, tokenFunctionPath, tokenHandler, auth=False, body=True, middleware=standardMiddleware)
+router.add(HTTP.methodGET, userFunctionPath, fetchUser, queryParams=[userIDKey, userIDsKey, fieldsKey], middleware=[*standardMiddleware, Router.conditional(userCacheControl, vary=["Authorization"])])
+router.add(HTTP.methodPOST, userFunctionPath, createUser, body=True, middleware=standardMiddleware)
+router.add(HTTP.methodPUT, userFunctionPath, updateUser, body=True, middleware=standardMiddleware)
+router.add(HTTP.methodGET, userIDFunctionPath, fetchUserID, queryParams=[usernameKey, usernamesKey], middleware=standardMiddleware)
+router.add(HTTP.methodPOST, postFunctionPath, publishPost, body=True, middleware=standardMiddleware)
+router.add(HTTP.methodGET, postFunctionPath, fetchPost, queryParams=[postIDKey, postIDsKey, fieldsKey], middleware=[*standardMiddleware, Router.conditional(postCacheControl, vary=["Authorization"])])
+router.add(HTTP.methodDELETE, postFunctionPath, deletePost, required=[postIDKey], middleware=standardMiddleware)
+router.add(HTTP.methodGET, timelineFunctionPath, fetchTimeline, queryParams=[limitKey, cursorKey], middleware=standardMiddleware)
+router.add(HTTP.methodPOST, followFunctionPath, followUser, required=[userIDKey], middleware=standardMiddleware)
+router.add(HTTP.methodDELETE, followFunctionPath, unfollowUser, required=[userIDKey], middleware=standardMiddleware)
+for relationPath in relationFunctionPaths:
+    router.add(HTTP.methodGET, relationPath, fetchRelations, queryParams=[limitKey, cursorKey], required=[userIDKey], middleware=standardMiddleware)
@@ -1,48 +1,226 @@
+import os
+from decimal import Decimal
 from .models.ListPost import ListPost
 from .models.SimplePost import SimplePost
-import boto3
-from boto3.dynamodb.conditions import Attr
+from .models.Post import attributeKeys as postKeys
+from .models.SimplePost import attributeKeys as simplePostKeys
+from .models.ListPost import attributeKeys as listPostKeys
+from . import Timeline
+from ..common import DynamoDB, DynamoDBCodec, Error, Fields, EntityCache
+from ..user import Graph, UserManager
 
 # DynamoDB
-dynamoDBResourceName = 'dynamodb'
 dynamoDBPostsTableName = 'Physical-iOS_Posts'
 dynamoDBUsersTableName = 'Physical-iOS_Users'
-dynamoDBItemKey = 'Item'
-dynamoDBRegionName = 'us-west-1'
-dynamodb = boto3.resource(dynamoDBResourceName, region_name=dynamoDBRegionName)
-postsTable = dynamodb.Table(dynamoDBPostsTableName)
-usersTable = dynamodb.Table(dynamoDBUsersTableName)
+dynamoDBItemKey = DynamoDB.dynamoDBItemKey
+
+# Every attribute a post of any type may have
+attributeKeys = postKeys + simplePostKeys + listPostKeys
+
+# Posts read by this container. Posts rarely change once published, so they
+# are cached for longer than user profiles.
+postCache = EntityCache.EntityCache(
+    "posts",
+    ttl=float(os.environ.get('POST_CACHE_TTL', 300)),
+    maxEntries=int(os.environ.get('POST_CACHE_SIZE', 10000))
+)
 
 def publish(postData: dict):
+    """
+    Stores a post, lists it under its author and increments their post count
+    in a single transaction, so that a post is never stored without its
+    author.
+
+    A retried publish replaces the stored post, as long as it keeps the
+    post's author and timestamp, so the post is listed and counted once.
+
+    Raises:
+        Error.NotFoundError: The post's author does not exist.
+        Error.ConflictError: Another post, or the same post with another
+            author or timestamp, already has the post's ID.
+        Exception: The post data is malformed. Nothing is written.
+    """
+
+    if "postType" not in postData:
+        raise Exception("The required attribute 'postType' is missing from the post data.")
+    postType = postData["postType"]
+    # verify formatting
     try:
-        postType = postData["postType"]
-        # verify formatting
         if postType == "SimplePost":
             _ = SimplePost(postData)
         elif postType == "ListPost":
             _ = ListPost(postData)
-        # upload post
-        postsTable.put_item(Item=postData)
-    except KeyError:
-        raise Exception("The required attribute 'postType' is missing from the post data.")
-    except:
-        raise
+        else:
+            raise Exception(f"Unknown postType '{postType}'.")
+    except KeyError as error:
+        raise Exception(error.args[0])
+    timestamp = postData["timestamp"]
+    if isinstance(timestamp, bool) or not isinstance(timestamp, (int, float, Decimal)):
+        raise Exception("The post's timestamp must be a number of seconds since epoch.")
 
-def fetch(postID: str) -> dict:
+    # upload post
+    item = DynamoDBCodec.encodeItem(postData)
+    postPut = {
+        "Put": {
+            "TableName": dynamoDBPostsTableName,
+            "Item": item,
+            "ConditionExpression": "attribute_not_exists(#postID)",
+            "ExpressionAttributeNames": {"#postID": "postID"}
+        }
+    }
     try:
-        response = postsTable.get_item(
-            Key = { "postID": postID }
-        )
+        Graph.addPost(postData["author"], postData["postID"], timestamp, writes=[postPut])
+    except Error.ConflictError:
+        # A retried publish finds the post already listed and counted, so only
+        # the post itself is replaced. Its author and timestamp, which the
+        # listing is keyed on, must not change.
+        try:
+            DynamoDB.client.put_item(
+                TableName=dynamoDBPostsTableName,
+                Item=item,
+                ConditionExpression="#author = :author AND #timestamp = :timestamp",
+                ExpressionAttributeNames={"#author": "author", "#timestamp": "timestamp"},
+                ExpressionAttributeValues={":author": item["author"], ":timestamp": item["timestamp"]}
+            )
+        except Exception as error:
+            if DynamoDB.conditionFailed(error):
+                raise Error.ConflictError("A post with this ID already exists.")
+            raise
+    except Error.NotFoundError:
+        raise Error.NotFoundError("The post's author does not exist.")
+
+    # A retried publish may have replaced a cached post
+    postCache.invalidate(postData["postID"])
+    # The author's post count changed
+    UserManager.profileCache.invalidate(postData["author"])
+
+    if Timeline.fanOutEnabled:
+        __fanOut(postData)
+
+def fetch(postID: str, fields: str = None) -> dict:
+    try:
+        # Only return the requested attributes, if the client asked for a subset
+        projection = Fields.parse(fields, attributeKeys)
 
-        return response[dynamoDBItemKey]
+        post = postCache.get(postID)
+        if post is None:
+            version = postCache.version()
+            response = DynamoDB.client.get_item(
+                TableName = dynamoDBPostsTableName,
+                Key = { "postID": { "S": postID } }
+            )
+            post = DynamoDBCodec.decodeItem(response[dynamoDBItemKey])
+            postCache.put(postID, post, version)
     except:
         raise
 
+    if projection:
+        return { key: post[key] for key in projection if key in post }
+    return dict(post)
+
+def fetchMany(postIDs: list, fields: str = None) -> tuple:
+    """
+    Fetches many posts with as few requests as possible.
+
+    Parameters:
+        postIDs: The unique identifiers of the posts to fetch.
+        fields: The comma-separated attributes to fetch, or `None` for all.
+
+    Returns:
+        A tuple of the posts that were found, in the order they were 
+        requested, and the identifiers of the posts that do not exist.
+    """
+
+    projection = Fields.parse(fields, attributeKeys)
+    posts = []
+    missing = []
+    for postID, item in DynamoDB.batchGet(dynamoDBPostsTableName, "postID", postIDs, projection):
+        if item is None:
+            missing.append(postID)
+        else:
+            posts.append(DynamoDBCodec.decodeItem(item))
+
+    return posts, missing
+
+def timeline(userID: str, limit: int, cursor: str = None) -> dict:
+    """
+    Fetches a page of the user's home timeline: the posts of the accounts 
+    they follow, and their own, newest first.
+
+    Parameters:
+        userID: The unique identifier of the user whose timeline is fetched.
+        limit: The maximum number of posts in the page.
+        cursor: The cursor returned with the previous page, if any.
+
+    Returns:
+        A dictionary containing the page of posts and the cursor for the next 
+        page, which is `None` once the timeline has been read in full.
+
+    Raises:
+        Error.InvalidCursorError: The cursor could not be decoded.
+    """
+
+    decodedCursor = Timeline.decodeCursor(cursor)
+    following = Graph.listAll(userID, Graph.relationFollowing)
+
+    authors = list(dict.fromkeys([userID, *following]))
+    sources = []
+    if Timeline.fanOutEnabled:
+        # Posts fanned out on write are read from the user's own partition, 
+        # only authors above the fan-out threshold are merged at read time.
+        # Entries of authors the user no longer follows are skipped.
+        sources.append(Timeline.MaterializedSource(userID, set(authors)))
+        celebrities = Timeline.celebrityAuthors()
+        authors = [author for author in authors if author in celebrities]
+    sources.extend(Timeline.AuthorSource(dynamoDBPostsTableName, author) for author in authors)
+    posts, nextCursor = Timeline.merge(sources, limit, decodedCursor, hydrate=__hydrate)
+
+    return {
+        "posts": posts,
+        "cursor": Timeline.encodeCursor(nextCursor)
+    }
+
 def delete(postID: str, userID: str):
     try:
-        _ = postsTable.delete_item(
-            Key = { "postID": postID },
-            ConditionExpression = Attr("author").eq(userID)
+        response = DynamoDB.client.delete_item(
+            TableName = dynamoDBPostsTableName,
+            Key = { "postID": { "S": postID } },
+            ConditionExpression = "author = :author",
+            ExpressionAttributeValues = { ":author": { "S": userID } },
+            ReturnValues = "ALL_OLD"
         )
     except:
-        raise
\ No newline at end of file
+        raise
+
+    postCache.invalidate(postID)
+    deletedPost = DynamoDBCodec.decodeItem(response.get("Attributes", {}))
+    if deletedPost:
+        try:
+            Graph.removePost(userID, postID, deletedPost["timestamp"])
+        except Error.NotFoundError:
+            pass
+        # The author's post count changed
+        UserManager.profileCache.invalidate(userID)
+
+def __fanOut(postData: dict):
+    # Failing to fan out must not fail the publish; the post is still 
+    # readable, just missing from followers' materialized timelines
+    try:
+        author = postData["author"]
+        response = DynamoDB.client.get_item(
+            TableName = dynamoDBUsersTableName,
+            Key = { "userID": { "S": author } },
+            **DynamoDB.projection(["followerCount"])
+        )
+        followerCount = DynamoDBCodec.decodeItem(response.get(dynamoDBItemKey, {})).get("followerCount", 0)
+
+        if followerCount > Timeline.fanOutMaxFollowers:
+            Timeline.registerCelebrity(author)
+        else:
+            Timeline.fanOut(postData, Graph.listAll(author, Graph.relationFollower))
+    except Exception as error:
+        print(f"Unable to fan out post {postData.get('postID')}. {error}")
+
+def __hydrate(postIDs: list) -> dict:
+    posts, _ = fetchMany(postIDs)
+    return { post["postID"]: post for post in posts }
\ No newline at end of file
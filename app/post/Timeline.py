@@ -0,0 +1,416 @@
+import os
+import abc
+import math
+import time
+import heapq
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from ..common import DynamoDB, DynamoDBCodec, Error, Cursor
+from ..user import Graph
+
+# Posts table index with `author` as partition key and `timestamp` as sort key
+authorIndexName = 'author-timestamp-index'
+authorKey = "author"
+timestampKey = "timestamp"
+postIDKey = "postID"
+
+# Materialized timelines, with `userID` as partition key and `entryKey` as sort key
+dynamoDBTimelinesTableName = 'Physical-iOS_Timelines'
+userIDKey = "userID"
+entryKeyKey = "entryKey"
+
+# Fan-out on write. Authors with more followers than the threshold are merged
+# into their followers' timelines at read time instead.
+fanOutEnabled = os.environ.get('TIMELINE_FANOUT_ENABLED', 'false').lower() == 'true'
+fanOutMaxFollowers = int(os.environ.get('TIMELINE_FANOUT_MAX_FOLLOWERS', 5000))
+# Posts of a newly followed author copied into the follower's timeline
+backfillSize = int(os.environ.get('TIMELINE_BACKFILL_SIZE', 50))
+
+# Registry of the authors whose posts are not fanned out
+celebrityRegistryKey = "#celebrities"
+celebrityAuthorsKey = "authors"
+celebrityRegistryTTL = 60
+
+# Items read by the first query of each author, before more are known to be needed
+initialBatchSize = 10
+# Concurrent queries issued when a page starts
+maxConcurrentQueries = 16
+
+__executor = ThreadPoolExecutor(max_workers=maxConcurrentQueries, thread_name_prefix="timeline")
+__registryLock = threading.Lock()
+__celebrityAuthors = set()
+__celebrityAuthorsLoadedAt = 0.0
+
+class ReverseOrder:
+    """
+    Wraps a value so that it sorts in the reverse of its natural order.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other) -> bool:
+        return self.value == other.value
+
+    def __lt__(self, other) -> bool:
+        return self.value > other.value
+
+def sortKey(timestamp, postID: str) -> tuple:
+    """
+    Returns the key that orders posts newest first: by timestamp, then by
+    post ID, both descending. Materialized entries sort the same way.
+    """
+
+    return (-timestamp, ReverseOrder(postID))
+
+class Source(abc.ABC):
+    """
+    A stream of posts in `sortKey` order that is read lazily, one batch at
+    a time.
+
+    Attributes:
+        exhausted:
+            Whether every post in the source has been read.
+        watermark:
+            The `[timestamp, postID]` the source resumes after, if any.
+    """
+
+    # Whether the source yields references that must be hydrated into full posts
+    referencesOnly = False
+
+    def __init__(self, queryParams: dict):
+        """
+        Constructs a new source, which starts from its newest post.
+
+        Parameters:
+            queryParams:
+                The parameters of the `Query` request that reads the source
+                newest-first.
+        """
+
+        self.queryParams = queryParams
+        self.buffer = deque()
+        self.exhausted = False
+        self.exclusiveStartKey = None
+        self.watermark = None
+
+    def resume(self, watermark: list):
+        """
+        Positions the source after `watermark`, the `[timestamp, postID]` of
+        the last post of the previous page. Only posts that sort after it
+        are read.
+        """
+
+        self.watermark = watermark
+        self.queryParams = self.boundedQuery(watermark)
+
+    @abc.abstractmethod
+    def boundedQuery(self, watermark: list) -> dict:
+        """
+        Returns the source's query parameters, with a key condition that
+        skips the posts newer than `watermark`.
+        """
+
+    def decode(self, item: dict) -> dict:
+        """
+        Returns the post represented by an item read from the source.
+        """
+
+        return DynamoDBCodec.decodeItem(item)
+
+    def includes(self, post: dict) -> bool:
+        """
+        Returns whether a post read from the source belongs in the timeline.
+        """
+
+        return True
+
+    def read(self, batchSize: int):
+        """
+        Reads the next batch of posts into the buffer.
+        """
+
+        if self.exhausted:
+            return
+
+        params = {**self.queryParams, "ScanIndexForward": False, "Limit": batchSize}
+        if self.exclusiveStartKey:
+            params["ExclusiveStartKey"] = self.exclusiveStartKey
+        response = DynamoDB.client.query(**params)
+
+        posts = (self.decode(item) for item in response.get("Items", []))
+        if self.watermark is not None:
+            # Key conditions cannot compare post IDs, so posts that share the
+            # watermark's timestamp are compared here
+            watermarkKey = sortKey(*self.watermark)
+            posts = (post for post in posts if sortKey(post[timestampKey], post[postIDKey]) > watermarkKey)
+        # An index orders posts that share a timestamp arbitrarily
+        self.buffer.extend(sorted((post for post in posts if self.includes(post)), key=lambda post: sortKey(post[timestampKey], post[postIDKey])))
+        self.exclusiveStartKey = response.get("LastEvaluatedKey")
+        if self.exclusiveStartKey is None:
+            self.exhausted = True
+
+    def peek(self, batchSize: int) -> dict:
+        """
+        Returns the newest unconsumed post, reading another batch if needed, or
+        `None` if the source has no more posts.
+        """
+
+        # Every post of a batch may have been left out
+        while not self.buffer and not self.exhausted:
+            self.read(batchSize)
+        return self.buffer[0] if self.buffer else None
+
+    def consume(self) -> dict:
+        return self.buffer.popleft()
+
+class AuthorSource(Source):
+    """
+    The posts of a single author, read from the posts table's author index.
+    """
+
+    def __init__(self, tableName: str, author: str):
+        self.author = author
+        super().__init__({
+            "TableName": tableName,
+            "IndexName": authorIndexName,
+            "KeyConditionExpression": "#author = :author",
+            "ExpressionAttributeNames": {"#author": authorKey},
+            "ExpressionAttributeValues": {":author": {"S": author}}
+        })
+
+    def boundedQuery(self, watermark: list) -> dict:
+        timestamp, _ = watermark
+        return {
+            **self.queryParams,
+            "KeyConditionExpression": "#author = :author AND #timestamp <= :timestamp",
+            "ExpressionAttributeNames": {"#author": authorKey, "#timestamp": timestampKey},
+            "ExpressionAttributeValues": {":author": {"S": self.author}, ":timestamp": {"N": str(timestamp)}}
+        }
+
+class MaterializedSource(Source):
+    """
+    The references to posts that were fanned out to a user's timeline when
+    they were published.
+
+    Entries are not removed when the user unfollows an author, so entries
+    whose author is not in `authors` are skipped as they are read.
+    """
+
+    referencesOnly = True
+
+    def __init__(self, userID: str, authors: set = None):
+        self.userID = userID
+        self.authors = authors
+        super().__init__({
+            "TableName": dynamoDBTimelinesTableName,
+            "KeyConditionExpression": "#userID = :userID",
+            "ExpressionAttributeNames": {"#userID": userIDKey},
+            "ExpressionAttributeValues": {":userID": {"S": userID}}
+        })
+
+    def boundedQuery(self, watermark: list) -> dict:
+        return {
+            **self.queryParams,
+            "KeyConditionExpression": "#userID = :userID AND #entryKey < :entryKey",
+            "ExpressionAttributeNames": {"#userID": userIDKey, "#entryKey": entryKeyKey},
+            "ExpressionAttributeValues": {":userID": {"S": self.userID}, ":entryKey": {"S": Graph.postEdgeTargetFor(*watermark)}}
+        }
+
+    def includes(self, post: dict) -> bool:
+        return self.authors is None or post[authorKey] in self.authors
+
+def merge(sources: list, limit: int, cursor: dict, hydrate=None) -> tuple:
+    """
+    Lazily merges sources into a single page of posts, in `sortKey` order.
+
+    The first batch of every source is read concurrently. After that, a
+    source is only read again when the page needs more of its posts. A post
+    yielded by more than one source, such as one fanned out before its author
+    crossed `fanOutMaxFollowers`, appears once.
+
+    Parameters:
+        sources:
+            The sources to merge, positioned at the start. They are resumed
+            after the cursor's watermark.
+        limit:
+            The maximum number of posts in the page.
+        cursor:
+            The decoded cursor of the previous page, or an empty dictionary.
+        hydrate:
+            A callable that takes a list of post IDs and returns the matching 
+            posts by ID. Required if any source only yields references. 
+            References to posts that no longer exist are left out of the page.
+
+    Returns:
+        A tuple of the page of posts and the cursor that resumes the merge,
+        or `None` if every source has been exhausted. The cursor holds only
+        the watermark `[timestamp, postID]` of the page's last post, so its
+        size does not depend on the number of sources.
+    """
+
+    watermark = cursor.get("w")
+    if watermark:
+        for source in sources:
+            source.resume(watermark)
+    batchSize = min(limit, initialBatchSize)
+
+    # Read the head of every source concurrently
+    list(__executor.map(lambda source: source.read(batchSize), sources))
+
+    heap = []
+    for index, source in enumerate(sources):
+        post = source.peek(limit)
+        if post is not None:
+            heap.append((sortKey(post[timestampKey], post[postIDKey]), index))
+    heapq.heapify(heap)
+
+    page = []
+    references = []
+    seen = set()
+    lastKey = None
+    while heap and (len(page) < limit or heap[0][0] == lastKey):
+        # Copies of a post share its key, so they leave the heap one after
+        # another, and copies of the page's last post are consumed with it
+        lastKey, index = heapq.heappop(heap)
+        source = sources[index]
+        post = source.consume()
+        if post[postIDKey] not in seen:
+            seen.add(post[postIDKey])
+            page.append(post)
+            watermark = [post[timestampKey], post[postIDKey]]
+            if source.referencesOnly:
+                references.append(post[postIDKey])
+        post = source.peek(limit)
+        if post is not None:
+            heapq.heappush(heap, (sortKey(post[timestampKey], post[postIDKey]), index))
+
+    if references:
+        hydrated = hydrate(references)
+        referenced = set(references)
+        page = [hydrated.get(post[postIDKey]) if post[postIDKey] in referenced else post for post in page]
+        page = [post for post in page if post is not None]
+
+    if not heap:
+        return page, None
+    return page, {"w": watermark}
+
+def fanOut(post: dict, followers: list):
+    """
+    Adds a reference to a newly published post to the materialized timelines 
+    of its author and their followers.
+
+    Parameters:
+        post: The published post.
+        followers: The unique identifiers of the author's followers.
+    """
+
+    items = [__entry(userID, post) for userID in dict.fromkeys([post[authorKey], *followers])]
+    DynamoDB.batchWrite(dynamoDBTimelinesTableName, items)
+
+def backfill(userID: str, tableName: str, author: str):
+    """
+    Adds references to the newest `backfillSize` posts of a newly followed
+    author to the user's materialized timeline. Posts of authors in
+    `celebrityAuthors` are merged at read time, so they are not copied.
+
+    Parameters:
+        userID: The unique identifier of the follower.
+        tableName: The name of the posts table.
+        author: The unique identifier of the followed author.
+    """
+
+    if backfillSize <= 0 or author in celebrityAuthors():
+        return
+
+    source = AuthorSource(tableName, author)
+    source.read(backfillSize)
+    DynamoDB.batchWrite(dynamoDBTimelinesTableName, [__entry(userID, post) for post in source.buffer])
+
+def registerCelebrity(author: str):
+    """
+    Records that the author's posts are not fanned out, so that their 
+    followers merge them into their timelines at read time.
+    """
+
+    if author in celebrityAuthors():
+        return
+
+    DynamoDB.client.update_item(
+        TableName=dynamoDBTimelinesTableName,
+        Key={
+            userIDKey: {"S": celebrityRegistryKey},
+            entryKeyKey: {"S": celebrityRegistryKey}
+        },
+        UpdateExpression="ADD #authors :author",
+        ExpressionAttributeNames={"#authors": celebrityAuthorsKey},
+        ExpressionAttributeValues={":author": {"SS": [author]}}
+    )
+    with __registryLock:
+        __celebrityAuthors.add(author)
+
+def celebrityAuthors() -> set:
+    """
+    Returns the authors whose posts are not fanned out. The registry is 
+    cached by the container for `celebrityRegistryTTL` seconds.
+    """
+
+    global __celebrityAuthors, __celebrityAuthorsLoadedAt
+
+    if time.monotonic() - __celebrityAuthorsLoadedAt < celebrityRegistryTTL:
+        return __celebrityAuthors
+
+    response = DynamoDB.client.get_item(
+        TableName=dynamoDBTimelinesTableName,
+        Key={
+            userIDKey: {"S": celebrityRegistryKey},
+            entryKeyKey: {"S": celebrityRegistryKey}
+        }
+    )
+    authors = set(response.get(DynamoDB.dynamoDBItemKey, {}).get(celebrityAuthorsKey, {}).get("SS", []))
+    with __registryLock:
+        __celebrityAuthors = authors
+        __celebrityAuthorsLoadedAt = time.monotonic()
+    return authors
+
+def encodeCursor(cursor: dict) -> str:
+    """
+    Encodes a cursor as an opaque string for clients.
+    """
+
+    return Cursor.encode(cursor)
+
+def decodeCursor(cursorString: str) -> dict:
+    """
+    Decodes a cursor provided by a client.
+
+    Raises:
+        Error.InvalidCursorError: The cursor could not be decoded.
+    """
+
+    cursor = Cursor.decode(cursorString)
+    if not cursor:
+        return cursor
+
+    # The watermark is the `[timestamp, postID]` of the previous page's last post
+    watermark = cursor.get("w")
+    if not isinstance(watermark, list) or len(watermark) != 2:
+        raise Error.InvalidCursorError()
+    timestamp, postID = watermark
+    if isinstance(timestamp, bool) or not isinstance(timestamp, (int, float)) or not math.isfinite(timestamp):
+        raise Error.InvalidCursorError()
+    if not isinstance(postID, str):
+        raise Error.InvalidCursorError()
+    return cursor
+
+def __entry(userID: str, post: dict) -> dict:
+    return {
+        userIDKey: {"S": userID},
+        entryKeyKey: {"S": Graph.postEdgeTargetFor(post[timestampKey], post[postIDKey])},
+        postIDKey: {"S": post[postIDKey]},
+        authorKey: {"S": post[authorKey]},
+        timestampKey: {"N": str(post[timestampKey])}
+    }
@@ -4,6 +4,9 @@ from .Post import Post
 # Attribute keys
 listKey = "list"
 
+# Attributes specific to `ListPost`
+attributeKeys = [listKey]
+
 class ListPost(Post):
     """
     A social post with a caption and an ordered list of songs from Apple Music.
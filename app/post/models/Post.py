@@ -7,6 +7,9 @@ authorKey = "author"
 timestampKey = "timestamp"
 captionKey = "caption"
 
+# Attributes common to every post
+attributeKeys = [postTypeKey, postIDKey, authorKey, timestampKey, captionKey]
+
 class Post:
     """
     The abstract superclass for all posts.
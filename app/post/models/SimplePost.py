@@ -5,6 +5,9 @@ from .Post import Post
 songURLKey = "songURL"
 mediaIDKey = "mediaID"
 
+# Attributes specific to `SimplePost`
+attributeKeys = [songURLKey, mediaIDKey]
+
 class SimplePost(Post):
     """
     A simple social post with a caption and content. The post's content may be 
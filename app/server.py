@@ -0,0 +1,272 @@
+import os
+import time
+import queue
+import base64
+import signal
+import socket
+import selectors
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+from .common import Event
+from .lambda_function import lambda_handler
+
+# Address the server listens on
+host = os.environ.get('SERVER_HOST', '0.0.0.0')
+port = int(os.environ.get('SERVER_PORT', 8080))
+
+# Requests handled at once. Workers are threads of one process, so they share
+# warm caches, keys and connection pools. A worker is only held while a
+# request is handled, not for the life of a connection.
+workers = int(os.environ.get('SERVER_WORKERS', 16))
+
+# Seconds an idle keep-alive connection is held open
+keepAliveTimeout = float(os.environ.get('SERVER_KEEP_ALIVE_TIMEOUT', 30))
+# Seconds a worker waits on a client while reading a request or writing a response
+requestTimeout = float(os.environ.get('SERVER_REQUEST_TIMEOUT', 10))
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """
+    Converts each HTTP request into the event that API Gateway passes to
+    `lambda_handler`, and the handler's response back into HTTP.
+
+    A handler lives as long as its connection. Unlike the base class, it
+    handles one request each time `handleNext` is called, so that the
+    connection can wait for its next request without holding a worker.
+
+    Attributes:
+        idleSince:
+            When the connection last finished a request, or was accepted.
+    """
+
+    protocol_version = "HTTP/1.1"
+    timeout = requestTimeout
+    # Headers and body are written separately, which Nagle's algorithm would delay
+    disable_nagle_algorithm = True
+
+    def __init__(self, request, client_address, server):
+        self.request = request
+        self.client_address = client_address
+        self.server = server
+        self.idleSince = time.monotonic()
+        self.setup()
+
+    def handleNext(self) -> bool:
+        """
+        Reads and handles one request.
+
+        Returns:
+            Whether the connection stays open for another request.
+        """
+
+        self.close_connection = True
+        self.handle_one_request()
+        return not self.close_connection
+
+    def hasBufferedRequest(self) -> bool:
+        """
+        Returns whether a pipelined request has already been read from the
+        socket. Its connection would not become readable again.
+        """
+
+        self.connection.setblocking(False)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def do_GET(self):
+        self.invoke()
+
+    def do_POST(self):
+        self.invoke()
+
+    def do_PUT(self):
+        self.invoke()
+
+    def do_DELETE(self):
+        self.invoke()
+
+    def invoke(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode() if length else None
+        # API Gateway keeps the last value of a repeated query parameter
+        queryParams = dict(parse_qsl(url.query, keep_blank_values=True))
+
+        event = {
+            Event.httpMethodKey: self.command,
+            Event.pathKey: url.path,
+            Event.httpHeadersKey: dict(self.headers.items()),
+            Event.queryParamsKey: queryParams or None,
+            Event.httpBodyKey: body
+        }
+        response = lambda_handler(event, None) or {}
+
+        body = response.get("body") or ""
+        data = base64.b64decode(body) if response.get("isBase64Encoded") else body.encode()
+        self.send_response(response.get("statusCode", 502))
+        for name, value in (response.get("headers") or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        if self.server.stopping:
+            # Let the client reconnect to another instance
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Routes log their own timings
+        pass
+
+class Server(HTTPServer):
+    """
+    An HTTP server that handles each request on a bounded pool of worker
+    threads.
+
+    Idle keep-alive connections are watched by a single poller thread. When
+    one becomes readable, its next request is dispatched to a worker, and
+    the connection returns to the poller once the response is sent. More
+    connections than workers can therefore be open at once, as a load
+    balancer keeps them, without any of them waiting for another to close.
+    """
+
+    # Connections waiting to be accepted. The default of 5 drops connection
+    # attempts when many clients connect at once.
+    request_queue_size = int(os.environ.get('SERVER_LISTEN_BACKLOG', 128))
+
+    def __init__(self, address: tuple, workers: int):
+        super().__init__(address, RequestHandler)
+        self.stopping = False
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="server")
+        self.__lock = threading.Lock()
+        self.__pollerStopped = False
+        self.__selector = selectors.DefaultSelector()
+        # Connections handed back to the poller by workers
+        self.__returned = queue.SimpleQueue()
+        self.__wakeup, self.__waker = socket.socketpair()
+        self.__waker.setblocking(False)
+        self.__selector.register(self.__wakeup, selectors.EVENT_READ)
+        self.__poller = threading.Thread(target=self.__poll, name="server-poller", daemon=True)
+        self.__poller.start()
+
+    def process_request(self, request, client_address):
+        # A new connection waits for its first request like an idle one
+        self.__park(RequestHandler(request, client_address, self))
+
+    def stop(self):
+        """
+        Stops accepting connections and closes idle ones, then waits for the
+        requests in progress to finish.
+        """
+
+        self.stopping = True
+        self.shutdown()
+        self.__wake()
+        self.__poller.join()
+        self.executor.shutdown(wait=True)
+        self.server_close()
+
+    def __handle(self, handler: RequestHandler):
+        try:
+            keepAlive = handler.handleNext()
+            while keepAlive and handler.hasBufferedRequest():
+                keepAlive = handler.handleNext()
+        except Exception:
+            self.handle_error(handler.request, handler.client_address)
+            keepAlive = False
+
+        if keepAlive:
+            self.__park(handler)
+        else:
+            self.__close(handler)
+
+    def __park(self, handler: RequestHandler):
+        # Hands a connection to the poller until its next request arrives
+        handler.idleSince = time.monotonic()
+        with self.__lock:
+            if not self.__pollerStopped:
+                self.__returned.put(handler)
+                self.__wake()
+                return
+        self.__close(handler)
+
+    def __wake(self):
+        try:
+            self.__waker.send(b"\0")
+        except OSError:
+            # The poller has wakeups pending already, or has stopped
+            pass
+
+    def __poll(self):
+        lastSweep = time.monotonic()
+        while not self.stopping:
+            for key, _ in self.__selector.select(timeout=1):
+                if key.fileobj is self.__wakeup:
+                    self.__wakeup.recv(4096)
+                    continue
+                self.__selector.unregister(key.fileobj)
+                self.executor.submit(self.__handle, key.data)
+
+            while True:
+                try:
+                    handler = self.__returned.get_nowait()
+                except queue.Empty:
+                    break
+                self.__selector.register(handler.connection, selectors.EVENT_READ, handler)
+
+            # Close connections that have been idle for too long
+            now = time.monotonic()
+            if now - lastSweep >= 1:
+                lastSweep = now
+                for key in list(self.__selector.get_map().values()):
+                    if key.data is not None and now - key.data.idleSince > keepAliveTimeout:
+                        self.__selector.unregister(key.fileobj)
+                        self.__close(key.data)
+
+        # Idle connections are closed at once, so clients reconnect to
+        # another instance instead of waiting for the keep-alive timeout
+        with self.__lock:
+            self.__pollerStopped = True
+        while True:
+            try:
+                self.__close(self.__returned.get_nowait())
+            except queue.Empty:
+                break
+        for key in list(self.__selector.get_map().values()):
+            if key.data is not None:
+                self.__close(key.data)
+        self.__selector.close()
+        self.__wakeup.close()
+        self.__waker.close()
+
+    def __close(self, handler: RequestHandler):
+        try:
+            handler.finish()
+        except Exception:
+            pass
+        self.shutdown_request(handler.request)
+
+def serve():
+    """
+    Serves the API until the process receives SIGTERM or SIGINT.
+    """
+
+    server = Server((host, port), workers)
+
+    def stop(signum, frame):
+        # `shutdown` waits for the serving loop, so it must run on another thread
+        threading.Thread(target=server.stop).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"Serving on {host}:{port} with {workers} workers.")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,217 @@
+from ..common import DynamoDB, Cursor, Error
+from .models.User import \
+    userIDKey, \
+    followerCountKey, \
+    followingCountKey, \
+    postCountKey
+
+# DynamoDB
+dynamoDBGraphTableName = 'Physical-iOS_Graph'
+dynamoDBUsersTableName = 'Physical-iOS_Users'
+edgeKeyKey = "edgeKey"
+
+# Edge kinds, used as sort key prefixes within a user's partition
+relationFollower = "follower"
+relationFollowing = "following"
+relationPost = "post"
+relations = [relationFollower, relationFollowing, relationPost]
+
+# Edge attributes
+targetKey = "target"
+
+def follow(userID: str, targetID: str):
+    """
+    Records that `userID` follows `targetID`, and updates both users' counts,
+    in a single transaction.
+
+    Raises:
+        Error.ConflictError: The user already follows the target.
+        Error.NotFoundError: Either user does not exist.
+    """
+
+    if userID == targetID:
+        raise ValueError("Users cannot follow themselves.")
+
+    __transact([
+        __putEdge(userID, relationFollowing, targetID),
+        __putEdge(targetID, relationFollower, userID),
+        __updateCount(userID, followingCountKey, 1),
+        __updateCount(targetID, followerCountKey, 1)
+    ], Error.ConflictError)
+
+def unfollow(userID: str, targetID: str):
+    """
+    Removes the record that `userID` follows `targetID`, and updates both
+    users' counts, in a single transaction.
+
+    Raises:
+        Error.NotFoundError: The user does not follow the target.
+    """
+
+    __transact([
+        __deleteEdge(userID, relationFollowing, targetID),
+        __deleteEdge(targetID, relationFollower, userID),
+        __updateCount(userID, followingCountKey, -1),
+        __updateCount(targetID, followerCountKey, -1)
+    ], Error.NotFoundError)
+
+def addPost(author: str, postID: str, timestamp, writes: list = ()):
+    """
+    Adds a post to its author's list of posts and increments their post count.
+
+    Parameters:
+        author: The unique identifier of the post's author.
+        postID: The unique identifier of the post.
+        timestamp: The post's timestamp.
+        writes: Other transaction items, such as the `Put` of the post itself,
+            written in the same transaction.
+
+    Raises:
+        Error.ConflictError: The post is already listed.
+        Error.NotFoundError: The author does not exist.
+    """
+
+    __transact([
+        __putEdge(author, relationPost, postEdgeTargetFor(timestamp, postID)),
+        __updateCount(author, postCountKey, 1),
+        *writes
+    ], Error.ConflictError)
+
+def removePost(author: str, postID: str, timestamp):
+    """
+    Removes a post from its author's list of posts and decrements their post
+    count.
+    """
+
+    __transact([
+        __deleteEdge(author, relationPost, postEdgeTargetFor(timestamp, postID)),
+        __updateCount(author, postCountKey, -1)
+    ], Error.NotFoundError)
+
+def postEdgeTargetFor(timestamp, postID: str) -> str:
+    """
+    Returns the sort key suffix of a post edge. Post edges sort in the same
+    order as the timestamps of their posts. Materialized timeline entries
+    (see `Timeline`) are keyed the same way.
+    """
+
+    return f"{float(timestamp):020.6f}#{postID}"
+
+def listPage(userID: str, relation: str, limit: int, cursor: str = None) -> dict:
+    """
+    Lists a page of a user's followers, followed accounts or posts.
+
+    Parameters:
+        userID: The unique identifier of the user.
+        relation: One of `relations`.
+        limit: The maximum number of identifiers in the page.
+        cursor: The cursor returned with the previous page, if any.
+
+    Returns:
+        A dictionary containing the page of user or post identifiers (posts
+        are listed newest first) and the cursor for the next page, which is
+        `None` once the list has been read in full.
+
+    Raises:
+        Error.InvalidCursorError: The cursor could not be decoded.
+    """
+
+    prefix = f"{relation}#"
+    params = {
+        "TableName": dynamoDBGraphTableName,
+        "KeyConditionExpression": "#userID = :userID AND begins_with(#edgeKey, :prefix)",
+        "ExpressionAttributeNames": {"#userID": userIDKey, "#edgeKey": edgeKeyKey, "#target": targetKey},
+        "ExpressionAttributeValues": {":userID": {"S": userID}, ":prefix": {"S": prefix}},
+        "ProjectionExpression": "#edgeKey, #target",
+        "ScanIndexForward": relation != relationPost,
+        "Limit": limit
+    }
+    decodedCursor = Cursor.decode(cursor)
+    if decodedCursor:
+        edgeKey = decodedCursor.get("k")
+        if not isinstance(edgeKey, str) or not edgeKey.startswith(prefix):
+            raise Error.InvalidCursorError()
+        params["ExclusiveStartKey"] = {userIDKey: {"S": userID}, edgeKeyKey: {"S": edgeKey}}
+
+    response = DynamoDB.client.query(**params)
+    identifiers = [item[targetKey]["S"] for item in response.get("Items", [])]
+    if relation == relationPost:
+        identifiers = [identifier.split("#", 1)[1] for identifier in identifiers]
+
+    lastKey = response.get("LastEvaluatedKey")
+    nextCursor = {"k": lastKey[edgeKeyKey]["S"]} if lastKey else None
+    return {
+        "ids": identifiers,
+        "cursor": Cursor.encode(nextCursor)
+    }
+
+def listAll(userID: str, relation: str) -> list:
+    """
+    Lists every follower, followed account or post of a user, reading as
+    many pages as needed.
+    """
+
+    identifiers = []
+    cursor = None
+    while True:
+        page = listPage(userID, relation, 1000, cursor)
+        identifiers.extend(page["ids"])
+        cursor = page["cursor"]
+        if cursor is None:
+            return identifiers
+
+def __putEdge(userID: str, relation: str, target: str) -> dict:
+    return {
+        "Put": {
+            "TableName": dynamoDBGraphTableName,
+            "Item": {
+                userIDKey: {"S": userID},
+                edgeKeyKey: {"S": f"{relation}#{target}"},
+                targetKey: {"S": target}
+            },
+            "ConditionExpression": "attribute_not_exists(#edgeKey)",
+            "ExpressionAttributeNames": {"#edgeKey": edgeKeyKey}
+        }
+    }
+
+def __deleteEdge(userID: str, relation: str, target: str) -> dict:
+    return {
+        "Delete": {
+            "TableName": dynamoDBGraphTableName,
+            "Key": {
+                userIDKey: {"S": userID},
+                edgeKeyKey: {"S": f"{relation}#{target}"}
+            },
+            "ConditionExpression": "attribute_exists(#edgeKey)",
+            "ExpressionAttributeNames": {"#edgeKey": edgeKeyKey}
+        }
+    }
+
+def __updateCount(userID: str, countKey: str, change: int) -> dict:
+    return {
+        "Update": {
+            "TableName": dynamoDBUsersTableName,
+            "Key": {userIDKey: {"S": userID}},
+            "UpdateExpression": "ADD #count :change",
+            "ConditionExpression": "attribute_exists(#userID)",
+            "ExpressionAttributeNames": {"#count": countKey, "#userID": userIDKey},
+            "ExpressionAttributeValues": {":change": {"N": str(change)}}
+        }
+    }
+
+def __transact(transactItems: list, conflictError):
+    try:
+        DynamoDB.client.transact_write_items(TransactItems=transactItems)
+    except Exception as error:
+        reasons = DynamoDB.cancellationReasons(error)
+        if reasons is None:
+            raise
+
+        # A failed edge condition is a conflict, a failed count update means
+        # that the user does not exist
+        failed = [transactItems[index] for index, code in enumerate(reasons) if code == DynamoDB.conditionalCheckFailed]
+        if any("Update" in item for item in failed):
+            raise Error.NotFoundError()
+        if failed:
+            raise conflictError()
+        raise
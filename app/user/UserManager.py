@@ -1,57 +1,184 @@
-import boto3
-import json
-from ..common import HTTP, Error
+import os
+from ..common import HTTP, Error, JSON, DynamoDB, DynamoDBCodec, Fields, EntityCache
 from .models.User import User
+from . import Graph, UsernameResolver
+from ..post import Timeline
 from .models.User import \
     usernameKey, \
     userIDKey, \
     displayNameKey, \
     biographyKey, \
-    followersKey, \
-    followingKey, \
+    followerCountKey, \
+    followingCountKey, \
     featuredKey, \
     collectionKey, \
-    postsKey, \
+    postCountKey, \
     coverPhotoURLKey, \
-    profilePhotoURLKey
+    profilePhotoURLKey, \
+    attributeKeys, \
+    cardKeys
 
 # DynamoDB
-dynamoDBResourceName = 'dynamodb'
 dynamoDBUsersTableName = 'Physical-iOS_Users'
 dynamoDBUsernamesTableName = 'Physical-iOS_Usernames'
-dynamoDBItemKey = 'Item'
-dynamoDBRegionName = 'us-west-1'
-dynamodb = boto3.resource(dynamoDBResourceName, region_name=dynamoDBRegionName)
-usersTable = dynamodb.Table(dynamoDBUsersTableName)
-usernamesTable = dynamodb.Table(dynamoDBUsernamesTableName)
+dynamoDBPostsTableName = 'Physical-iOS_Posts'
+dynamoDBItemKey = DynamoDB.dynamoDBItemKey
+
+# User profiles read by this container, in DynamoDB's wire format
+profileCache = EntityCache.EntityCache(
+    "users",
+    ttl=float(os.environ.get('USER_CACHE_TTL', 30)),
+    maxEntries=int(os.environ.get('USER_CACHE_SIZE', 5000))
+)
 
 def exchangeUsernameForUserID(username):
-    dbResponse = usernamesTable.get_item(
-        Key={
-            usernameKey: username
-        }
-    )
-    
-    item = dbResponse[dynamoDBItemKey]
-    return item[userIDKey]
+    """
+    Returns the user ID of the user with the given username.
+
+    Raises:
+        Error.NotFoundError: No user has the username.
+    """
+
+    return UsernameResolver.resolve(username)
+
+def exchangeUsernamesForUserIDs(usernames):
+    """
+    Resolves many usernames at once. See `UsernameResolver.resolveMany`.
+    """
+
+    return UsernameResolver.resolveMany(usernames)
 
 # GET
-def getUser(userID):
-    # Request the user profile from DynamoDB
+def getUser(userID, fields=None):
+    # Only read the requested attributes, if the client asked for a subset
     try:
-        dbResponse = usersTable.get_item(
-            Key={
-                userIDKey: userID
-            }
-        )
-        
-        userProfile = dbResponse[dynamoDBItemKey]
-    except Exception as e:
-        return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, json.dumps({"message":f"A problem ocurred while attempting to retrieve the user profile. {e}"}))
+        projection = Fields.parse(fields, attributeKeys)
+    except Error.InvalidFieldsError as e:
+        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, JSON.message(str(e)))
+
+    # Request the user profile from DynamoDB, unless this container read it
+    # recently
+    userProfile = profileCache.get(userID)
+    if userProfile is None:
+        try:
+            version = profileCache.version()
+            dbResponse = DynamoDB.client.get_item(
+                TableName=dynamoDBUsersTableName,
+                Key={
+                    userIDKey: {"S": userID}
+                }
+            )
+            
+            userProfile = dbResponse[dynamoDBItemKey]
+        except Exception as e:
+            return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, JSON.message(f"A problem ocurred while attempting to retrieve the user profile. {e}"))
+        profileCache.put(userID, userProfile, version)
+
+    if projection:
+        userProfile = {key: userProfile[key] for key in projection if key in userProfile}
         
-    # Return the user profile
-    return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, json.dumps(userProfile))
+    # Return the user profile, serialized straight from the wire format
+    return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, DynamoDBCodec.dumpItem(userProfile))
     
+# GET (many)
+def getUserCards(userIDs, fields=None):
+    """
+    Fetches the attributes needed to render many users in a list, such as a 
+    list of followers.
+
+    Parameters:
+        userIDs: The unique identifiers of the users to fetch.
+        fields: 
+            The comma-separated attributes to fetch. Defaults to the 
+            attributes of a user card (see `User.cardKeys`).
+
+    Returns:
+        The HTTP response, whose body lists the users that were found in the 
+        order they were requested, followed by the IDs that do not exist.
+    """
+
+    try:
+        projection = Fields.parse(fields, attributeKeys) or cardKeys
+    except Error.InvalidFieldsError as e:
+        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, JSON.message(str(e)))
+
+    # Serialize each chunk of users as soon as it arrives
+    cards = []
+    missing = []
+    try:
+        for userID, item in DynamoDB.batchGet(dynamoDBUsersTableName, userIDKey, userIDs, projection):
+            if item is None:
+                missing.append(userID)
+            else:
+                cards.append(DynamoDBCodec.dumpItem(item))
+    except Exception as e:
+        return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, JSON.message(f"A problem ocurred while attempting to retrieve the users. {e}"))
+
+    body = '{"users":[' + ",".join(cards) + '],"missing":' + JSON.dumps(missing) + '}'
+    return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, body)
+
+# GET (followers / following / posts)
+def getRelations(userID, relation, limit, cursor=None):
+    """
+    Lists a page of a user's followers, followed accounts or posts.
+
+    Parameters:
+        userID: The unique identifier of the user.
+        relation: One of `Graph.relations`.
+        limit: The maximum number of identifiers in the page.
+        cursor: The cursor returned with the previous page, if any.
+
+    Returns:
+        The HTTP response, whose body contains the page of identifiers and the 
+        cursor for the next page.
+    """
+
+    try:
+        page = Graph.listPage(userID, relation, limit, cursor)
+    except Error.InvalidCursorError as e:
+        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, JSON.message(str(e)))
+    except Exception as e:
+        return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, JSON.message(f"A problem ocurred while attempting to retrieve the list. {e}"))
+
+    return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, JSON.dumps(page))
+
+# POST (follow)
+def follow(userID, targetID):
+    try:
+        Graph.follow(userID, targetID)
+    except ValueError as e:
+        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, JSON.message(str(e)))
+    except Error.ConflictError:
+        return HTTP.response(HTTP.statusConflict, HTTP.standardHTTPResponseHeaders, JSON.message("The user is already followed."))
+    except Error.NotFoundError:
+        return HTTP.response(HTTP.statusNotFound, HTTP.standardHTTPResponseHeaders, JSON.message("The user does not exist."))
+    except Exception as e:
+        return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, JSON.message(f"A problem ocurred while attempting to follow the user. {e}"))
+
+    # Both users' counts changed
+    profileCache.invalidate(userID, targetID)
+
+    if Timeline.fanOutEnabled:
+        # Failing to backfill must not fail the follow; the target's earlier
+        # posts are just missing from the user's materialized timeline
+        try:
+            Timeline.backfill(userID, dynamoDBPostsTableName, targetID)
+        except Exception as e:
+            print(f"Unable to backfill the timeline of {userID} with the posts of {targetID}. {e}")
+    return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, "")
+
+# DELETE (follow)
+def unfollow(userID, targetID):
+    try:
+        Graph.unfollow(userID, targetID)
+    except Error.NotFoundError:
+        return HTTP.response(HTTP.statusNotFound, HTTP.standardHTTPResponseHeaders, JSON.message("The user is not followed."))
+    except Exception as e:
+        return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, JSON.message(f"A problem ocurred while attempting to unfollow the user. {e}"))
+
+    profileCache.invalidate(userID, targetID)
+    return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, "")
+
 # POST
 def createUser(userDict):
     
@@ -60,39 +187,45 @@ def createUser(userDict):
     try:
         user = User(userDict)
     except:
-        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, json.dumps({"message": "A required attribute is missing from the request body."}))
+        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, JSON.message("A required attribute is missing from the request body."))
     
-    # Create the user in the users table
-    try:
-        usersTable.put_item(
-            Item={
-                userIDKey: user.userID,
-                usernameKey: user.username,
-                displayNameKey: user.displayName,
-                biographyKey: user.biography,
-                followersKey: user.followers,
-                followingKey: user.following,
-                featuredKey: user.featured,
-                collectionKey: user.collection,
-                postsKey: user.posts,
-                coverPhotoURLKey: user.coverPhotoURL,
-                profilePhotoURLKey: user.profilePhotoURL
-            }
-        )
-    except: 
-        return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, json.dumps({"message":"A problem ocurred while attempting to add the user to the users table."}))
-        
-    # Associates user ID and username by adding them to the user ID table in dynamo db.
+    # Create the user and claim the username in a single transaction, so 
+    # neither can exist without the other.
+    userItem = {
+        userIDKey: user.userID,
+        usernameKey: user.username,
+        displayNameKey: user.displayName,
+        biographyKey: user.biography,
+        followerCountKey: 0,
+        followingCountKey: 0,
+        featuredKey: user.featured,
+        collectionKey: user.collection,
+        postCountKey: 0,
+        coverPhotoURLKey: user.coverPhotoURL,
+        profilePhotoURLKey: user.profilePhotoURL
+    }
     try:
-        usernamesTable.put_item(
-            Item={
-                usernameKey: user.username,
-                userIDKey: user.userID
-            }
-        )
-    except:
-        return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, json.dumps({"message":"A problem ocurred while attempting to associate the specified user ID and username."}))
+        DynamoDB.client.transact_write_items(TransactItems=[
+            {
+                "Put": {
+                    "TableName": dynamoDBUsersTableName,
+                    "Item": DynamoDBCodec.encodeItem(userItem),
+                    "ConditionExpression": "attribute_not_exists(#userID)",
+                    "ExpressionAttributeNames": {"#userID": userIDKey}
+                }
+            },
+            __claimUsername(user.username, user.userID)
+        ])
+    except Exception as e:
+        reasons = DynamoDB.cancellationReasons(e)
+        if reasons and reasons[1] == DynamoDB.conditionalCheckFailed:
+            return __usernameTakenResponse()
+        if reasons and reasons[0] == DynamoDB.conditionalCheckFailed:
+            return HTTP.response(HTTP.statusConflict, HTTP.standardHTTPResponseHeaders, JSON.message("The user already exists."))
+        return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, JSON.message("A problem ocurred while attempting to add the user to the users table."))
         
+    # The username may have been cached as missing
+    UsernameResolver.invalidate(user.username)
     return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, "")
 
 # PUT
@@ -101,22 +234,80 @@ def updateUser(userDict):
     try:
         user = User(userDict)
     except:
-        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, json.dumps({"message": "A required attribute is missing from the request body."}))
-        
-    # Attempt to update the user's profile
+        return HTTP.response(HTTP.statusBadRequest, HTTP.standardHTTPResponseHeaders, JSON.message("A required attribute is missing from the request body."))
+
+    # Find out whether the username is changing
     try:
-        usersTable.update_item(
-            Key={userIDKey: user.userID},
-            UpdateExpression=f"SET {usernameKey} = :{usernameKey}, {displayNameKey} = :{displayNameKey}, {biographyKey} = :{biographyKey}, {coverPhotoURLKey} = :{coverPhotoURLKey}, {profilePhotoURLKey} = :{profilePhotoURLKey}",
-            ExpressionAttributeValues={
+        dbResponse = DynamoDB.client.get_item(
+            TableName=dynamoDBUsersTableName,
+            Key={userIDKey: {"S": user.userID}},
+            **DynamoDB.projection([usernameKey])
+        )
+        currentUsername = dbResponse[dynamoDBItemKey][usernameKey]["S"]
+    except KeyError:
+        return HTTP.response(HTTP.statusNotFound, HTTP.standardHTTPResponseHeaders, JSON.message("The user does not exist."))
+    except:
+        return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, JSON.message("A problem ocurred while attempting to update the user object."))
+
+    # Update the profile. A username change also claims the new username and 
+    # releases the old one, all in a single transaction.
+    profileUpdate = {
+        "Update": {
+            "TableName": dynamoDBUsersTableName,
+            "Key": {userIDKey: {"S": user.userID}},
+            "UpdateExpression": f"SET {usernameKey} = :{usernameKey}, {displayNameKey} = :{displayNameKey}, {biographyKey} = :{biographyKey}, {coverPhotoURLKey} = :{coverPhotoURLKey}, {profilePhotoURLKey} = :{profilePhotoURLKey}",
+            # Fails if the username changed since it was read
+            "ConditionExpression": f"{usernameKey} = :currentUsername",
+            "ExpressionAttributeValues": DynamoDBCodec.encodeItem({
                 f":{usernameKey}": user.username,
                 f":{displayNameKey}": user.displayName,
                 f":{biographyKey}": user.biography,
                 f":{coverPhotoURLKey}": user.coverPhotoURL,
-                f":{profilePhotoURLKey}": user.profilePhotoURL
+                f":{profilePhotoURLKey}": user.profilePhotoURL,
+                ":currentUsername": currentUsername
+            })
+        }
+    }
+    transactItems = [profileUpdate]
+    if user.username != currentUsername:
+        transactItems.append(__claimUsername(user.username, user.userID))
+        transactItems.append({
+            "Delete": {
+                "TableName": dynamoDBUsernamesTableName,
+                "Key": {usernameKey: {"S": currentUsername}},
+                "ConditionExpression": "#userID = :userID",
+                "ExpressionAttributeNames": {"#userID": userIDKey},
+                "ExpressionAttributeValues": {":userID": {"S": user.userID}}
             }
-        )
-    except:
-        return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, json.dumps({"message":"A problem ocurred while attempting to update the user object."}))
+        })
+
+    try:
+        DynamoDB.client.transact_write_items(TransactItems=transactItems)
+    except Exception as e:
+        reasons = DynamoDB.cancellationReasons(e)
+        if reasons and len(reasons) > 1 and reasons[1] == DynamoDB.conditionalCheckFailed:
+            return __usernameTakenResponse()
+        if reasons and DynamoDB.conditionalCheckFailed in reasons:
+            return HTTP.response(HTTP.statusConflict, HTTP.standardHTTPResponseHeaders, JSON.message("The user was modified concurrently. Please try again."))
+        return HTTP.response(HTTP.statusInternalError, HTTP.standardHTTPResponseHeaders, JSON.message("A problem ocurred while attempting to update the user object."))
     
+    profileCache.invalidate(user.userID)
+    if user.username != currentUsername:
+        UsernameResolver.invalidate(user.username, currentUsername)
     return HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, "")
+
+def __claimUsername(username, userID) -> dict:
+    return {
+        "Put": {
+            "TableName": dynamoDBUsernamesTableName,
+            "Item": {
+                usernameKey: {"S": username},
+                userIDKey: {"S": userID}
+            },
+            "ConditionExpression": "attribute_not_exists(#username)",
+            "ExpressionAttributeNames": {"#username": usernameKey}
+        }
+    }
+
+def __usernameTakenResponse():
+    return HTTP.response(HTTP.statusConflict, HTTP.standardHTTPResponseHeaders, JSON.message("The username is already taken."))
@@ -0,0 +1,95 @@
+import os
+from ..common import DynamoDB, Error, EntityCache
+from .models.User import usernameKey, userIDKey
+
+# DynamoDB
+dynamoDBUsernamesTableName = 'Physical-iOS_Usernames'
+dynamoDBItemKey = DynamoDB.dynamoDBItemKey
+
+# Usernames known to exist, mapped to their user IDs. A username only maps to
+# another user after it is released, so entries are kept for a long time.
+__found = EntityCache.EntityCache(
+    "usernames",
+    ttl=float(os.environ.get('USERNAME_CACHE_TTL', 600)),
+    maxEntries=int(os.environ.get('USERNAME_CACHE_SIZE', 100000))
+)
+# Usernames known not to exist. These are kept briefly, so that a newly
+# claimed username resolves soon on every container.
+__missing = EntityCache.EntityCache(
+    "missingUsernames",
+    ttl=float(os.environ.get('MISSING_USERNAME_CACHE_TTL', 30)),
+    maxEntries=int(os.environ.get('MISSING_USERNAME_CACHE_SIZE', 10000))
+)
+
+def resolve(username: str) -> str:
+    """
+    Returns the user ID of the user with the given username.
+
+    Raises:
+        Error.NotFoundError: No user has the username.
+    """
+
+    userID = __found.get(username)
+    if userID is not None:
+        return userID
+    if __missing.get(username) is not None:
+        raise __notFound(username)
+
+    foundVersion, missingVersion = __found.version(), __missing.version()
+    dbResponse = DynamoDB.client.get_item(
+        TableName=dynamoDBUsernamesTableName,
+        Key={usernameKey: {"S": username}}
+    )
+    item = dbResponse.get(dynamoDBItemKey)
+    if item is None:
+        __missing.put(username, True, missingVersion)
+        raise __notFound(username)
+
+    userID = item[userIDKey]["S"]
+    __found.put(username, userID, foundVersion)
+    return userID
+
+def resolveMany(usernames: list) -> tuple:
+    """
+    Resolves many usernames at once, such as the mentions in a caption.
+    Usernames that are not cached are read with as few requests as possible.
+
+    Parameters:
+        usernames: The usernames to resolve.
+
+    Returns:
+        A tuple of a dictionary mapping each username that exists to its user
+        ID, and the usernames that do not exist, in the order requested.
+    """
+
+    userIDs = {}
+    uncached = []
+    for username in dict.fromkeys(usernames):
+        userID = __found.get(username)
+        if userID is not None:
+            userIDs[username] = userID
+        elif __missing.get(username) is None:
+            uncached.append(username)
+
+    foundVersion, missingVersion = __found.version(), __missing.version()
+    for username, item in DynamoDB.batchGet(dynamoDBUsernamesTableName, usernameKey, uncached, [userIDKey]):
+        if item is None:
+            __missing.put(username, True, missingVersion)
+        else:
+            userIDs[username] = item[userIDKey]["S"]
+            __found.put(username, userIDs[username], foundVersion)
+
+    missing = [username for username in dict.fromkeys(usernames) if username not in userIDs]
+    return userIDs, missing
+
+def invalidate(*usernames):
+    """
+    Forgets what is known about the given usernames, after this container
+    has claimed or released them.
+    """
+
+    __found.invalidate(*usernames)
+    __missing.invalidate(*usernames)
+
+def __notFound(username: str) -> Error.NotFoundError:
+    return Error.NotFoundError(f"No user has the username {username}.")
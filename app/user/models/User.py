@@ -5,14 +5,32 @@ usernameKey = "username"
 userIDKey = "userID"
 displayNameKey = "displayName"
 biographyKey = "biography"
-followersKey = "followers"
-followingKey = "following"
+followerCountKey = "followerCount"
+followingCountKey = "followingCount"
 featuredKey = "featured"
 collectionKey = "collection"
-postsKey = "posts"
+postCountKey = "postCount"
 coverPhotoURLKey = "coverPhotoURL"
 profilePhotoURLKey = "profilePhotoURL"
 
+# Every attribute of a user item
+attributeKeys = [
+    userIDKey,
+    usernameKey,
+    displayNameKey,
+    biographyKey,
+    followerCountKey,
+    followingCountKey,
+    featuredKey,
+    collectionKey,
+    postCountKey,
+    coverPhotoURLKey,
+    profilePhotoURLKey
+]
+
+# The attributes needed to render a user in a list
+cardKeys = [userIDKey, usernameKey, displayNameKey, profilePhotoURLKey]
+
 # An object representing a user.
 #
 # Attributes:
@@ -20,11 +38,11 @@ profilePhotoURLKey = "profilePhotoURL"
 #    - username: The unique username chosen by the user.
 #    - displayName: The user's chosen display name.
 #    - biography: The user's biography.
-#    - followers: The unique user identifiers of the user's followers.
-#    - following: The unique user identifiers of the user's followed accounts.
 #    - featured: The Music Item ID of the user's featured Music Item.
 #    - collection: The unique identifier of the user's collection.
-#    - posts: The unique identifiers of the user's authored posts.
+#
+# Followers, followed accounts and posts are stored as edges in the graph
+# table (see `Graph.py`). The user item only holds their counts.
 class User:
     def __init__(self, userDict):
         try:
@@ -32,11 +50,8 @@ class User:
             self.userID = userDict[userIDKey]
             self.displayName = userDict[displayNameKey]
             self.biography = userDict[biographyKey]
-            self.followers = userDict[followersKey]
-            self.following = userDict[followingKey]
             self.featured = userDict[featuredKey]
             self.collection = userDict[collectionKey]
-            self.posts = userDict[postsKey]
             self.coverPhotoURL = userDict[coverPhotoURLKey]
             self.profilePhotoURL = userDict[profilePhotoURLKey]
         except:
@@ -0,0 +1,136 @@
+import os
+import sys
+import uuid
+import pytest
+
+# Credentials and region for the mocked AWS account
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-west-1")
+# Key files are only read when a token is signed
+os.environ.setdefault("PRIVATE_KEY_FILE", "/nonexistent/private-key.pem")
+os.environ.setdefault("ENCRYPTION_PASSWORD_FILE", "/nonexistent/encryption-password")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moto import mock_aws
+from app.common import DynamoDB, DynamoDBCodec
+
+# Key schema of each table: partition key, optional sort key (name, type)
+tables = {
+    "Physical-iOS_Users": [("userID", "S")],
+    "Physical-iOS_Usernames": [("username", "S")],
+    "Physical-iOS_Posts": [("postID", "S")],
+    "Physical-iOS_Graph": [("userID", "S"), ("edgeKey", "S")],
+    "Physical-iOS_Timelines": [("userID", "S"), ("entryKey", "S")],
+    "Physical-iOS_Tokens": [("tokenHash", "S")]
+}
+
+@pytest.fixture
+def dynamodb():
+    """
+    Creates every table of the app in a mocked DynamoDB, and points the
+    shared client at it.
+    """
+
+    with mock_aws():
+        DynamoDB.configure(endpointURL=None)
+        client = DynamoDB.client.get()
+        for tableName, keys in tables.items():
+            params = {
+                "TableName": tableName,
+                "KeySchema": [{"AttributeName": name, "KeyType": keyType} for (name, _), keyType in zip(keys, ["HASH", "RANGE"])],
+                "AttributeDefinitions": [{"AttributeName": name, "AttributeType": attributeType} for name, attributeType in keys],
+                "BillingMode": "PAY_PER_REQUEST"
+            }
+            if tableName == "Physical-iOS_Posts":
+                params["AttributeDefinitions"] += [
+                    {"AttributeName": "author", "AttributeType": "S"},
+                    {"AttributeName": "timestamp", "AttributeType": "N"}
+                ]
+                params["GlobalSecondaryIndexes"] = [{
+                    "IndexName": "author-timestamp-index",
+                    "KeySchema": [
+                        {"AttributeName": "author", "KeyType": "HASH"},
+                        {"AttributeName": "timestamp", "KeyType": "RANGE"}
+                    ],
+                    "Projection": {"ProjectionType": "ALL"}
+                }]
+            client.create_table(**params)
+        yield client
+        DynamoDB.configure(endpointURL=None)
+
+@pytest.fixture
+def userData():
+    """
+    Returns a function that builds, without storing, a user with every
+    profile attribute. Keyword arguments override attributes.
+    """
+
+    def build(**attributes) -> dict:
+        return {
+            "userID": str(uuid.uuid4()),
+            "username": f"user-{uuid.uuid4().hex[:8]}",
+            "displayName": "Name",
+            "biography": "Bio",
+            "followerCount": 0,
+            "followingCount": 0,
+            "featured": [],
+            "collection": [],
+            "postCount": 0,
+            "coverPhotoURL": "https://example.com/cover.png",
+            "profilePhotoURL": "https://example.com/profile.png",
+            **attributes
+        }
+
+    return build
+
+@pytest.fixture
+def newUser(dynamodb, userData):
+    """
+    Returns a function that stores a user with every profile attribute, and
+    returns the user. Keyword arguments override attributes.
+    """
+
+    def create(**attributes) -> dict:
+        user = userData(**attributes)
+        dynamodb.put_item(TableName="Physical-iOS_Users", Item=DynamoDBCodec.encodeItem(user))
+        dynamodb.put_item(TableName="Physical-iOS_Usernames", Item=DynamoDBCodec.encodeItem({"username": user["username"], "userID": user["userID"]}))
+        return user
+
+    return create
+
+@pytest.fixture
+def postData():
+    """
+    Returns a function that builds, without storing, a `SimplePost` by
+    `author` at `timestamp`. Keyword arguments override attributes.
+    """
+
+    def build(author: str, timestamp: float = 100.5, **attributes) -> dict:
+        return {
+            "postID": str(uuid.uuid4()),
+            "author": author,
+            "timestamp": timestamp,
+            "postType": "SimplePost",
+            "caption": "Caption",
+            "songURL": "https://music.apple.com/song",
+            "mediaID": "",
+            **attributes
+        }
+
+    return build
+
+@pytest.fixture
+def newPost(dynamodb, postData):
+    """
+    Returns a function that stores a `SimplePost` by `author` at `timestamp`,
+    and returns the post. Keyword arguments override attributes.
+    """
+
+    def create(author: str, timestamp: float, **attributes) -> dict:
+        post = postData(author, timestamp, **attributes)
+        dynamodb.put_item(TableName="Physical-iOS_Posts", Item=DynamoDBCodec.encodeItem(post))
+        return post
+
+    return create
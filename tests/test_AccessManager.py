@@ -0,0 +1,21 @@
+import pytest
+from app.access import AccessManager
+
+def test_refresh_token_is_exchanged_once(dynamodb, monkeypatch):
+    monkeypatch.setattr(AccessManager, "__generateAccessTokenFor", lambda sub: f"access-{sub}")
+    refreshToken = AccessManager.provideAccessFor("user").refreshToken
+
+    access = AccessManager.exchange(refreshToken)
+
+    assert access.accessToken == "access-user"
+    with pytest.raises(Exception):
+        AccessManager.exchange(refreshToken)
+
+def test_revoked_refresh_token_cannot_be_exchanged(dynamodb, monkeypatch):
+    monkeypatch.setattr(AccessManager, "__generateAccessTokenFor", lambda sub: f"access-{sub}")
+    refreshToken = AccessManager.provideAccessFor("user").refreshToken
+
+    AccessManager.revoke(refreshToken)
+
+    with pytest.raises(Exception):
+        AccessManager.exchange(refreshToken)
@@ -0,0 +1,48 @@
+import time
+import pytest
+from app.common import JSON, HTTPClient
+from app.auth import AuthenticationManager, AppleKeyStore
+
+def test_unknown_grant_type():
+    response = AuthenticationManager.authenticate({"grantType": "password", "identityToken": "token"})
+
+    assert response["statusCode"] == 400
+    assert JSON.loads(response["body"]) == {"message": "The grant type must be `authorization_code` or `refresh_token`."}
+
+def test_verification_bound_by_deadline(monkeypatch):
+    def verifyToken(identityToken):
+        # Such as fetching Apple's public keys from an unresponsive endpoint
+        time.sleep(1)
+        return {"sub": "user"}
+
+    monkeypatch.setattr(AuthenticationManager, "authenticationDeadline", 0.1)
+    monkeypatch.setattr(AuthenticationManager, "verifyToken", verifyToken)
+    monkeypatch.setattr(AuthenticationManager, "validate", lambda token, grantType: None)
+
+    start = time.monotonic()
+    response = AuthenticationManager.authenticate({"grantType": "authorization_code", "authorizationCode": "code", "identityToken": "token"})
+
+    assert response["statusCode"] == 504
+    assert time.monotonic() - start < 0.5
+
+def test_failed_apple_key_fetch_backs_off(monkeypatch):
+    fetches = []
+    def get(url, timeout):
+        fetches.append(url)
+        raise ConnectionError("Apple is unavailable.")
+
+    monkeypatch.setattr(HTTPClient, "get", get)
+    for name, value in [("__keys", {}), ("__fetchedAt", 0.0), ("__retryAt", 0.0), ("__failedFetches", 0), ("__lastUnknownFetch", 0.0)]:
+        monkeypatch.setattr(AppleKeyStore, name, value)
+
+    # Without any keys, repeated logins still fetch only once
+    for _ in range(3):
+        with pytest.raises(KeyError):
+            AppleKeyStore.keyFor("kid")
+    assert len(fetches) == 1
+
+    # Once the unknown key interval has passed, the backoff still applies
+    monkeypatch.setattr(AppleKeyStore, "__lastUnknownFetch", 0.0)
+    with pytest.raises(KeyError):
+        AppleKeyStore.keyFor("kid")
+    assert len(fetches) == 1
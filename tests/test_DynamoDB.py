@@ -0,0 +1,19 @@
+from app.common import DynamoDB, DynamoDBCodec, JSON
+
+def test_client_accepts_wire_format(dynamodb):
+    item = DynamoDBCodec.encodeItem({"userID": "a", "username": "alice", "postCount": 3})
+    DynamoDB.client.put_item(TableName="Physical-iOS_Users", Item=item)
+
+    response = DynamoDB.client.get_item(TableName="Physical-iOS_Users", Key={"userID": {"S": "a"}})
+
+    assert DynamoDBCodec.decodeItem(response["Item"]) == {"userID": "a", "username": "alice", "postCount": 3}
+    assert JSON.loads(DynamoDBCodec.dumpItem(response["Item"])) == {"userID": "a", "username": "alice", "postCount": 3}
+
+def test_batch_get_yields_in_request_order(dynamodb):
+    for userID in ["a", "b", "c"]:
+        DynamoDB.client.put_item(TableName="Physical-iOS_Users", Item={"userID": {"S": userID}})
+
+    results = list(DynamoDB.batchGet("Physical-iOS_Users", "userID", ["c", "x", "a", "c"]))
+
+    assert [key for key, _ in results] == ["c", "x", "a", "c"]
+    assert [item is not None for _, item in results] == [True, False, True, True]
@@ -0,0 +1,45 @@
+import pytest
+from app.common import DynamoDB, Error
+from app.user import Graph
+
+def count(userID: str, countKey: str) -> int:
+    item = DynamoDB.client.get_item(TableName="Physical-iOS_Users", Key={"userID": {"S": userID}})["Item"]
+    return int(item[countKey]["N"])
+
+def test_follow(newUser):
+    user, target = newUser(), newUser()
+
+    Graph.follow(user["userID"], target["userID"])
+
+    assert Graph.listAll(user["userID"], Graph.relationFollowing) == [target["userID"]]
+    assert Graph.listAll(target["userID"], Graph.relationFollower) == [user["userID"]]
+    assert count(user["userID"], "followingCount") == 1
+    assert count(target["userID"], "followerCount") == 1
+
+def test_follow_twice_conflicts(newUser):
+    user, target = newUser(), newUser()
+    Graph.follow(user["userID"], target["userID"])
+
+    with pytest.raises(Error.ConflictError):
+        Graph.follow(user["userID"], target["userID"])
+
+    assert count(target["userID"], "followerCount") == 1
+
+def test_follow_missing_user(newUser):
+    user = newUser()
+
+    with pytest.raises(Error.NotFoundError):
+        Graph.follow(user["userID"], "missing")
+
+    assert Graph.listAll(user["userID"], Graph.relationFollowing) == []
+
+def test_unfollow(newUser):
+    user, target = newUser(), newUser()
+    Graph.follow(user["userID"], target["userID"])
+
+    Graph.unfollow(user["userID"], target["userID"])
+
+    assert Graph.listAll(user["userID"], Graph.relationFollowing) == []
+    assert count(target["userID"], "followerCount") == 0
+    with pytest.raises(Error.NotFoundError):
+        Graph.unfollow(user["userID"], target["userID"])
@@ -0,0 +1,108 @@
+import pytest
+from app.common import DynamoDB, Error
+from app.post import PostManager
+from app.user import Graph
+
+def storedPost(postID: str) -> dict:
+    return DynamoDB.client.get_item(TableName="Physical-iOS_Posts", Key={"postID": {"S": postID}}).get("Item")
+
+def test_fetch_post(newPost):
+    post = newPost("author", 100.5)
+
+    fetched = PostManager.fetch(post["postID"])
+
+    assert fetched["postID"] == post["postID"]
+    assert fetched["timestamp"] == 100.5
+
+def test_fetch_post_fields(newPost):
+    post = newPost("author", 100)
+
+    assert PostManager.fetch(post["postID"], "author") == {"author": "author"}
+
+def test_publish(newUser, postData):
+    user = newUser()
+    post = postData(user["userID"])
+
+    PostManager.publish(post)
+
+    assert PostManager.fetch(post["postID"]) == post
+    assert Graph.listAll(user["userID"], Graph.relationPost) == [post["postID"]]
+    assert DynamoDB.client.get_item(TableName="Physical-iOS_Users", Key={"userID": {"S": user["userID"]}})["Item"]["postCount"] == {"N": "1"}
+
+def test_publish_retry_counts_once(newUser, postData):
+    user = newUser()
+    post = postData(user["userID"])
+
+    PostManager.publish(post)
+    PostManager.publish({**post, "caption": "Edited"})
+
+    assert storedPost(post["postID"])["caption"] == {"S": "Edited"}
+    assert DynamoDB.client.get_item(TableName="Physical-iOS_Users", Key={"userID": {"S": user["userID"]}})["Item"]["postCount"] == {"N": "1"}
+
+def test_publish_without_author_stores_nothing(dynamodb, postData):
+    post = postData("missing")
+
+    with pytest.raises(Error.NotFoundError):
+        PostManager.publish(post)
+
+    assert storedPost(post["postID"]) is None
+
+@pytest.mark.parametrize("attributes", [{"postType": "VideoPost"}, {"timestamp": "yesterday"}, {"timestamp": None}])
+def test_publish_invalid_post_stores_nothing(newUser, postData, attributes):
+    post = postData(newUser()["userID"], **attributes)
+
+    with pytest.raises(Exception):
+        PostManager.publish(post)
+
+    assert storedPost(post["postID"]) is None
+
+def test_fetch_many_posts(newPost):
+    # More posts than a single BatchGetItem request reads
+    posts = [newPost("author", timestamp) for timestamp in range(150)]
+    postIDs = [post["postID"] for post in reversed(posts)]
+
+    fetched, missing = PostManager.fetchMany([postIDs[0], "missing", *postIDs[1:]])
+
+    assert [post["postID"] for post in fetched] == postIDs
+    assert fetched[0] == posts[-1]
+    assert missing == ["missing"]
+
+def test_fetch_many_posts_fields(newPost):
+    post = newPost("author", 100)
+
+    assert PostManager.fetchMany([post["postID"]], "postID,author") == ([{"postID": post["postID"], "author": "author"}], [])
+
+def test_publish_retry_keeps_author(newUser, postData):
+    user, other = newUser(), newUser()
+    post = postData(user["userID"])
+    PostManager.publish(post)
+
+    with pytest.raises(Error.ConflictError):
+        PostManager.publish({**post, "author": other["userID"]})
+
+    assert storedPost(post["postID"])["author"] == {"S": user["userID"]}
+    assert Graph.listAll(other["userID"], Graph.relationPost) == []
+    assert DynamoDB.client.get_item(TableName="Physical-iOS_Users", Key={"userID": {"S": other["userID"]}})["Item"]["postCount"] == {"N": "0"}
+
+def test_publish_retry_keeps_timestamp(newUser, postData):
+    user = newUser()
+    post = postData(user["userID"])
+    PostManager.publish(post)
+
+    with pytest.raises(Error.ConflictError):
+        PostManager.publish({**post, "timestamp": 200})
+
+    assert Graph.listAll(user["userID"], Graph.relationPost) == [post["postID"]]
+    assert DynamoDB.client.get_item(TableName="Physical-iOS_Users", Key={"userID": {"S": user["userID"]}})["Item"]["postCount"] == {"N": "1"}
+
+def test_delete_post(newUser, postData):
+    user, other = newUser(), newUser()
+    post = postData(user["userID"])
+    PostManager.publish(post)
+
+    with pytest.raises(Exception):
+        PostManager.delete(post["postID"], other["userID"])
+    PostManager.delete(post["postID"], user["userID"])
+
+    assert storedPost(post["postID"]) is None
+    assert Graph.listAll(user["userID"], Graph.relationPost) == []
@@ -0,0 +1,42 @@
+import pytest
+from app.common import HTTP, Compression, Router
+
+def route(body: str) -> Router.Route:
+    handler = lambda request: HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, body)
+    return Router.Route("GET", "/", handler, [Router.compress, Router.conditional("private, max-age=0")])
+
+def call(route: Router.Route, **headers) -> dict:
+    return route.call(Router.Request({"httpMethod": "GET", "path": "/", "headers": headers}))
+
+@pytest.mark.parametrize("acceptEncoding", ["gzip", None])
+def test_not_modified_repeats_validator_and_vary(acceptEncoding):
+    large = route("x" * Compression.minimumSize)
+    headers = {"Accept-Encoding": acceptEncoding} if acceptEncoding else {}
+
+    full = call(large, **headers)
+    notModified = call(large, **headers, **{"If-None-Match": full["headers"]["ETag"]})
+
+    assert full["statusCode"] == 200
+    assert full["headers"]["ETag"].startswith("W/") == (acceptEncoding is not None)
+    assert notModified["statusCode"] == 304
+    assert notModified["headers"]["ETag"] == full["headers"]["ETag"]
+    assert notModified["headers"]["Vary"] == full["headers"]["Vary"] == "Accept-Encoding"
+
+def test_not_modified_small_body():
+    small = route("x")
+
+    full = call(small, **{"Accept-Encoding": "gzip"})
+    notModified = call(small, **{"Accept-Encoding": "gzip", "If-None-Match": full["headers"]["ETag"]})
+
+    assert notModified["statusCode"] == 304
+    assert notModified["headers"]["ETag"] == full["headers"]["ETag"]
+    assert "Vary" not in full["headers"] and "Vary" not in notModified["headers"]
+
+def test_vary_lists_every_header():
+    handler = lambda request: HTTP.response(HTTP.statusOK, HTTP.standardHTTPResponseHeaders, "x" * Compression.minimumSize)
+    authenticated = Router.Route("GET", "/", handler, [Router.compress, Router.conditional("public, max-age=30", vary=["Authorization"])])
+
+    full = call(authenticated)
+    notModified = call(authenticated, **{"If-None-Match": full["headers"]["ETag"]})
+
+    assert full["headers"]["Vary"] == notModified["headers"]["Vary"] == "Authorization, Accept-Encoding"
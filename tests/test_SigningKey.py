@@ -0,0 +1,45 @@
+import os
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from app.access import SigningKey, KeyResolver
+
+@pytest.fixture
+def keyFiles(tmp_path, monkeypatch):
+    privateKeyFile = tmp_path / "private-key.pem"
+    passwordFile = tmp_path / "password"
+    passwordFile.write_bytes(b"password")
+    privateKeyFile.write_bytes(ec.generate_private_key(ec.SECP256R1()).private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.BestAvailableEncryption(b"password")
+    ))
+    monkeypatch.setattr(SigningKey, "privateKeyFile", str(privateKeyFile))
+    monkeypatch.setattr(SigningKey, "encryptionPasswordFile", str(passwordFile))
+    for name, value in [("__privateKey", None), ("__keyID", None), ("__version", None), ("__lastCheck", 0.0), ("__loadError", None)]:
+        monkeypatch.setattr(SigningKey, name, value)
+    monkeypatch.setattr(SigningKey, "__publicKeys", {})
+    return privateKeyFile, passwordFile
+
+def test_failed_reload_keeps_previous_key(keyFiles, monkeypatch, capsys):
+    _, passwordFile = keyFiles
+    key, keyID = SigningKey.current()
+
+    # The password is rotated before the key
+    passwordFile.write_bytes(b"rotated")
+    os.utime(passwordFile, ns=(1, 1))
+    monkeypatch.setattr(SigningKey, "reloadCheckInterval", -1)
+
+    assert SigningKey.current() == (key, keyID)
+    assert keyID in SigningKey.publicKeys()
+    assert "Unable to reload the signing key" in capsys.readouterr().out
+
+def test_published_key_without_local_key(monkeypatch):
+    publishedKey = ec.generate_private_key(ec.SECP256R1()).public_key()
+    monkeypatch.setattr(KeyResolver, "__publishedKeys", {"published": publishedKey})
+    monkeypatch.setattr(KeyResolver, "__nextRefreshAt", float("inf"))
+    monkeypatch.setattr(KeyResolver, "__lastUnknownRefresh", float("inf"))
+
+    assert KeyResolver.keyFor("published") is publishedKey
+    with pytest.raises(KeyError):
+        KeyResolver.keyFor("unknown")
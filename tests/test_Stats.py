@@ -0,0 +1,25 @@
+import json
+from app.common import EntityCache, Stats
+
+def test_caches_report_their_counters(monkeypatch, capsys):
+    cache = EntityCache.EntityCache("statsTest", ttl=60, maxEntries=10)
+    cache.put("key", "value", cache.version())
+    cache.get("key")
+    cache.get("missing")
+    monkeypatch.setattr(Stats, "reportInterval", 0)
+
+    Stats.report()
+    Stats.report()
+
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert lines[-1]["stats"]["cache:statsTest"]["hits"] == 1
+    assert lines[-1]["stats"]["cache:statsTest"]["misses"] == 1
+
+def test_reports_once_per_interval(monkeypatch, capsys):
+    monkeypatch.setattr(Stats, "reportInterval", 3600)
+    Stats.report()
+    capsys.readouterr()
+
+    Stats.report()
+
+    assert capsys.readouterr().out == ""
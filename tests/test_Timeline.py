@@ -0,0 +1,100 @@
+import pytest
+from app.common import Cursor, Error
+from app.post import PostManager, Timeline
+from app.user import Graph, UserManager
+
+def test_decode_cursor_round_trip():
+    cursor = {"w": [100.5, "post"]}
+
+    assert Timeline.decodeCursor(Timeline.encodeCursor(cursor)) == cursor
+
+@pytest.mark.parametrize("cursor", [
+    {"p": {"author": [1, "post"]}},
+    {"w": "x"},
+    {"w": [1, 2, 3]},
+    {"w": [1]},
+    {"w": ["1", "post"]},
+    {"w": [True, "post"]},
+    {"w": [1, 2]},
+])
+def test_decode_cursor_rejects_malformed_watermark(cursor):
+    with pytest.raises(Error.InvalidCursorError):
+        Timeline.decodeCursor(Cursor.encode(cursor))
+
+def test_timeline_pages(newUser, newPost):
+    user, followed = newUser(), newUser()
+    Graph.follow(user["userID"], followed["userID"])
+    posts = [newPost(author, timestamp) for author, timestamp in [
+        (user["userID"], 1), (followed["userID"], 2), (user["userID"], 3)
+    ]]
+
+    first = PostManager.timeline(user["userID"], 2)
+    second = PostManager.timeline(user["userID"], 2, first["cursor"])
+
+    assert [post["postID"] for post in first["posts"]] == [posts[2]["postID"], posts[1]["postID"]]
+    assert [post["postID"] for post in second["posts"]] == [posts[0]["postID"]]
+    assert second["cursor"] is None
+
+def timelineIDs(userID: str, limit: int) -> list:
+    postIDs = []
+    cursor = None
+    while True:
+        page = PostManager.timeline(userID, limit, cursor)
+        postIDs.extend(post["postID"] for post in page["posts"])
+        cursor = page["cursor"]
+        if cursor is None:
+            return postIDs
+
+@pytest.fixture
+def fanOut(monkeypatch):
+    monkeypatch.setattr(Timeline, "fanOutEnabled", True)
+
+@pytest.mark.parametrize("limit", [1, 2, 10])
+def test_fanned_out_post_of_celebrity_appears_once(newUser, postData, fanOut, monkeypatch, limit):
+    user, author = newUser(), newUser()
+    UserManager.follow(user["userID"], author["userID"])
+    first = postData(author["userID"], 1)
+    PostManager.publish(first)
+    # The author crosses the threshold, so later posts are merged at read time
+    monkeypatch.setattr(Timeline, "fanOutMaxFollowers", 0)
+    second = postData(author["userID"], 2)
+    PostManager.publish(second)
+
+    assert timelineIDs(user["userID"], limit) == [second["postID"], first["postID"]]
+
+def test_follow_backfills_timeline(newUser, newPost, fanOut):
+    user, author = newUser(), newUser()
+    post = newPost(author["userID"], 1)
+
+    UserManager.follow(user["userID"], author["userID"])
+
+    assert timelineIDs(user["userID"], 10) == [post["postID"]]
+
+def test_unfollowed_author_leaves_timeline(newUser, postData, fanOut):
+    user, author = newUser(), newUser()
+    UserManager.follow(user["userID"], author["userID"])
+    post = postData(author["userID"], 1)
+    PostManager.publish(post)
+    assert timelineIDs(user["userID"], 10) == [post["postID"]]
+
+    UserManager.unfollow(user["userID"], author["userID"])
+
+    assert timelineIDs(user["userID"], 10) == []
+
+def test_cursor_size_does_not_grow_with_follows(newUser, newPost):
+    user = newUser()
+    for _ in range(50):
+        author = newUser()
+        Graph.follow(user["userID"], author["userID"])
+        newPost(author["userID"], 1)
+
+    page = PostManager.timeline(user["userID"], 10)
+
+    assert len(page["cursor"]) < 100
+
+def test_timeline_pages_through_equal_timestamps(newUser, newPost):
+    user, followed = newUser(), newUser()
+    Graph.follow(user["userID"], followed["userID"])
+    posts = [newPost(author, 5) for author in [user["userID"], followed["userID"]] * 3]
+
+    assert timelineIDs(user["userID"], 1) == sorted((post["postID"] for post in posts), reverse=True)
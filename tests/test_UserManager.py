@@ -0,0 +1,90 @@
+import uuid
+import pytest
+from app.common import Error, JSON
+from app.user import UserManager
+
+def test_get_user(newUser):
+    user = newUser()
+
+    response = UserManager.getUser(user["userID"])
+
+    assert response["statusCode"] == 200
+    assert JSON.loads(response["body"]) == user
+
+def test_get_user_fields(newUser):
+    user = newUser()
+
+    response = UserManager.getUser(user["userID"], "username,postCount")
+
+    assert JSON.loads(response["body"]) == {"username": user["username"], "postCount": 0}
+
+def test_create_user(dynamodb, userData):
+    user = userData()
+
+    assert UserManager.createUser(user)["statusCode"] == 200
+
+    assert JSON.loads(UserManager.getUser(user["userID"])["body"]) == user
+    assert UserManager.exchangeUsernameForUserID(user["username"]) == user["userID"]
+
+def test_create_user_with_taken_username(dynamodb, newUser, userData):
+    existing = newUser()
+    user = userData(username=existing["username"])
+
+    response = UserManager.createUser(user)
+
+    assert response["statusCode"] == 409
+    assert JSON.loads(response["body"]) == {"message": "The username is already taken."}
+    assert "Item" not in dynamodb.get_item(TableName="Physical-iOS_Users", Key={"userID": {"S": user["userID"]}})
+
+def test_create_existing_user(newUser, userData):
+    existing = newUser()
+
+    response = UserManager.createUser(userData(userID=existing["userID"]))
+
+    assert response["statusCode"] == 409
+    assert JSON.loads(response["body"]) == {"message": "The user already exists."}
+
+def test_update_user_renames(newUser):
+    user = newUser()
+    renamed = {**user, "username": f"user-{uuid.uuid4().hex[:8]}", "displayName": "Renamed"}
+
+    assert UserManager.updateUser(renamed)["statusCode"] == 200
+
+    assert JSON.loads(UserManager.getUser(user["userID"])["body"]) == renamed
+    assert UserManager.exchangeUsernameForUserID(renamed["username"]) == user["userID"]
+    with pytest.raises(Error.NotFoundError):
+        UserManager.exchangeUsernameForUserID(user["username"])
+
+def test_update_user_with_taken_username(newUser):
+    user, other = newUser(), newUser()
+
+    response = UserManager.updateUser({**user, "username": other["username"]})
+
+    assert response["statusCode"] == 409
+    assert JSON.loads(response["body"]) == {"message": "The username is already taken."}
+    assert JSON.loads(UserManager.getUser(user["userID"])["body"]) == user
+
+def test_update_missing_user(dynamodb, userData):
+    assert UserManager.updateUser(userData())["statusCode"] == 404
+
+def test_get_user_cards(newUser):
+    users = [newUser() for _ in range(120)]
+    userIDs = [user["userID"] for user in users]
+
+    response = UserManager.getUserCards([userIDs[0], "missing", *userIDs[1:]])
+
+    assert response["statusCode"] == 200
+    body = JSON.loads(response["body"])
+    assert body["users"] == [
+        {key: user[key] for key in ["userID", "username", "displayName", "profilePhotoURL"]}
+        for user in users
+    ]
+    assert body["missing"] == ["missing"]
+
+def test_get_user_cards_fields(newUser):
+    user = newUser(followerCount=3)
+
+    response = UserManager.getUserCards([user["userID"]], "followerCount")
+
+    # The key is always read, to match items to the requested IDs
+    assert JSON.loads(response["body"]) == {"users": [{"userID": user["userID"], "followerCount": 3}], "missing": []}
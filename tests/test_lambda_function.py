@@ -0,0 +1,75 @@
+import uuid
+from app import lambda_function
+from app.common import JSON, Router
+from app.user import Graph, UsernameResolver
+
+def get(path: str, **queryParams) -> dict:
+    # Calls the route's handler directly, without authentication
+    route = lambda_function.router.routes[("GET", path)]
+    return route.handler(Router.Request({
+        "httpMethod": "GET",
+        "path": path,
+        "headers": {},
+        "queryStringParameters": queryParams
+    }))
+
+def test_fetch_posts(newPost):
+    post = newPost("author", 100)
+
+    response = get("/post", postIDs=f"{post['postID']},missing")
+
+    assert response["statusCode"] == 200
+    assert JSON.loads(response["body"]) == {"posts": [post], "missing": ["missing"]}
+
+def test_fetch_users(newUser):
+    user = newUser()
+
+    response = get("/user", userIDs=f"missing,{user['userID']}")
+
+    assert response["statusCode"] == 200
+    assert JSON.loads(response["body"]) == {
+        "users": [{"userID": user["userID"], "username": user["username"], "displayName": "Name", "profilePhotoURL": user["profilePhotoURL"]}],
+        "missing": ["missing"]
+    }
+
+def test_fetch_user_id(newUser):
+    user = newUser()
+
+    response = get("/userID", username=user["username"])
+
+    assert response["statusCode"] == 200
+    assert JSON.loads(response["body"]) == {"user ID": user["userID"]}
+
+def test_fetch_missing_user_id(dynamodb):
+    response = get("/userID", username=f"missing-{uuid.uuid4().hex}")
+
+    assert response["statusCode"] == 404
+
+def test_fetch_user_id_created_after_miss(dynamodb, newUser):
+    username = f"user-{uuid.uuid4().hex[:8]}"
+    assert get("/userID", username=username)["statusCode"] == 404
+
+    user = newUser(username=username)
+    UsernameResolver.invalidate(username)
+
+    assert JSON.loads(get("/userID", username=username)["body"]) == {"user ID": user["userID"]}
+
+def test_fetch_user_ids(newUser):
+    users = [newUser() for _ in range(3)]
+
+    response = get("/userID", usernames=",".join([users[0]["username"], "missing", users[1]["username"], users[2]["username"]]))
+
+    assert response["statusCode"] == 200
+    assert JSON.loads(response["body"]) == {
+        "userIDs": {user["username"]: user["userID"] for user in users},
+        "missing": ["missing"]
+    }
+
+def test_publish_post_as_another_user(newUser):
+    user, other = newUser(), newUser()
+    request = Router.Request({"httpMethod": "POST", "path": "/post", "headers": {}})
+    request.subject = user["userID"]
+    request.body = {"postID": str(uuid.uuid4()), "author": other["userID"], "timestamp": 1, "postType": "SimplePost", "caption": "", "songURL": "", "mediaID": ""}
+
+    assert lambda_function.publishPost(request)["statusCode"] == 403
+    assert Graph.listAll(other["userID"], Graph.relationPost) == []
@@ -0,0 +1,42 @@
+import time
+import threading
+import http.client
+import pytest
+from app import server
+
+@pytest.fixture
+def running():
+    instance = server.Server(("127.0.0.1", 0), 2)
+    thread = threading.Thread(target=instance.serve_forever)
+    thread.start()
+    yield instance
+    if not instance.stopping:
+        instance.stop()
+    thread.join()
+
+def connect(instance: server.Server) -> http.client.HTTPConnection:
+    return http.client.HTTPConnection("127.0.0.1", instance.server_address[1], timeout=5)
+
+def get(connection: http.client.HTTPConnection) -> int:
+    connection.request("GET", "/missing")
+    response = connection.getresponse()
+    response.read()
+    return response.status
+
+def test_serves_more_connections_than_workers(running):
+    connections = [connect(running) for _ in range(8)]
+    for _ in range(3):
+        # Every kept-alive connection is served in turn, not only the first two
+        assert [get(connection) for connection in connections] == [501] * 8
+
+def test_stop_closes_idle_connections(running):
+    connections = [connect(running) for _ in range(4)]
+    for connection in connections:
+        get(connection)
+
+    start = time.monotonic()
+    running.stop()
+
+    assert time.monotonic() - start < server.keepAliveTimeout / 2
+    with pytest.raises((http.client.HTTPException, OSError)):
+        get(connections[0])